@@ -1,19 +1,14 @@
-import os
 import difflib
-import datetime
-from llm import LLM
+from llm import LLM, format_stats, print_token
+from file_index import find_python_files
+from backup_store import DEFAULT_BACKUP_DIR, BackupStore, rollback_command
 
-BACKUP_DIR = "backups"
-LOG_FILE = "update_log.txt"
+BACKUP_DIR = DEFAULT_BACKUP_DIR
+# Files longer than this are edited through diffs of the relevant functions instead of full rewrites
+DIFF_MODE_MIN_LINES = 150
 
 def list_python_files(base_dir="."):
-    python_files = []
-    for root, dirs, files in os.walk(base_dir):
-        for file in files:
-            if file.endswith(".py") and not file.startswith("__"):
-                full_path = os.path.join(root, file)
-                python_files.append(full_path)
-    return python_files
+    return find_python_files(base_dir)
 
 def select_file(files):
     print("\n📄 Available Python files:\n")
@@ -46,21 +41,15 @@ def show_diff(before, after):
         print(line)
     print("-" * 40)
 
-def backup_file(path, content):
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    name = os.path.basename(path)
-    backup_path = os.path.join(BACKUP_DIR, f"{timestamp}_{name}")
-    with open(backup_path, "w") as f:
-        f.write(content)
-    print(f"🛡️  Backup saved to: {backup_path}")
-    return backup_path
-
-def log_update(filename, instruction, backup_path):
-    with open(LOG_FILE, "a") as log:
-        timestamp = datetime.datetime.now().isoformat()
-        log.write(f"[{timestamp}] Updated {filename} based on instruction: '{instruction}'\n")
-        log.write(f"Backup: {backup_path}\n\n")
+def record_update(path, before, after, instruction):
+    """Keep both versions in the deduplicated backup store and log the edit."""
+    store = BackupStore(BACKUP_DIR)
+    try:
+        edit_id = store.record(path, before, after, instruction)
+    finally:
+        store.close()
+    print(f"🛡️  Saved as edit #{edit_id} (undo: {rollback_command(path, edit_id, BACKUP_DIR)})")
+    return edit_id
 
 def main():
     python_files = list_python_files()
@@ -76,20 +65,26 @@ def main():
     with open(selected_file, "r") as f:
         current_code = f.read()
 
+    # Choose the model first so it preloads while the instruction is being typed
+    llm = LLM()
     instruction = input("💬 What should I change or add in the code?\n> ")
 
-    llm = LLM()
-    updated_code = llm.apply_suggestion(current_code, instruction)
+    print("\n🤖 Generating update...\n")
+    if len(current_code.splitlines()) >= DIFF_MODE_MIN_LINES:
+        updated_code = llm.apply_suggestion_diff(current_code, instruction, on_token=print_token)
+    else:
+        updated_code = llm.apply_suggestion(current_code, instruction, on_token=print_token)
+    print("\n" + format_stats(llm.last_stats))
 
     show_diff(current_code, updated_code)
 
     confirm = input("\n💾 Overwrite original file with updated code? (y/n): ")
     if confirm.lower() == "y":
-        backup_path = backup_file(selected_file, current_code)
+        # Recorded before writing, so an interrupted write can always be rolled back
+        record_update(selected_file, current_code, updated_code, instruction)
         with open(selected_file, "w") as f:
             f.write(updated_code)
         print("✅ File updated.")
-        log_update(selected_file, instruction, backup_path)
 
     run = input("\n🚀 Do you want to run the updated code now? (y/n): ")
     if run.lower() == "y":
@@ -1,66 +1,60 @@
 import os
-import requests
-from typing import List
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
-from llama_index.llms.ollama import Ollama
-from llama_index.embeddings.base import BaseEmbedding 
 from llm import LLM
-
-
-class CustomOllamaEmbedding(BaseEmbedding):
-    def __init__(self, model_name="nomic-embed-text", host="http://localhost:11434"):
-        self.model_name = model_name
-        self.host = host
-
-    def _embed(self, texts: List[str]) -> List[List[float]]:
-        results = []
-        for text in texts:
-            response = requests.post(
-                f"{self.host}/api/embeddings",
-                json={"model": self.model_name, "prompt": text}
-            )
-            response.raise_for_status()
-            embedding = response.json()["embedding"]
-            results.append(embedding)
-        return results
-
-    def embed(self, texts: List[str]) -> List[List[float]]:
-        return self._embed(texts)
-
-    def embed_query(self, text: str) -> List[float]:
-        return self._embed([text])[0]
+from file_index import DEFAULT_IGNORED_DIRS
+from startup import preimport
 
 
 def find_docs_folder(start_path="."):
-    for root, dirs, _ in os.walk(start_path):
-        if "docs" in dirs:
-            return os.path.join(root, "docs")
+    """Breadth-first search for the shallowest 'docs' folder, skipping caches, venvs and VCS dirs."""
+    pending = [start_path]
+    while pending:
+        subdirs = []
+        for path in pending:
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted((e for e in it if e.is_dir(follow_symlinks=False)), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name == "docs":
+                    return entry.path
+                if entry.name not in DEFAULT_IGNORED_DIRS and not entry.name.startswith("."):
+                    subdirs.append(entry.path)
+        pending = subdirs
     return None
 
 
 def main():
+    # llama_index takes seconds to import; load it while the model is being chosen
+    loading = preimport("docindex", "retrieval", "llama_index.core.query_engine")
     docs_path = find_docs_folder(os.path.dirname(__file__))
 
     if not docs_path or not os.path.exists(docs_path):
         print("❌ Could not find a 'docs' folder anywhere in the project.")
         return
 
-    print(f"📄 Found and loading documents from: {docs_path}")
-    documents = SimpleDirectoryReader(docs_path).load_data()
+    print(f"📄 Found documents in: {docs_path}")
 
     # Step 2: Use your custom LLM wrapper to select or set a model
     core_llm = LLM()
-    index_llm = Ollama(model=core_llm.model)
+    loading.join()
+    from llama_index.core.query_engine import RetrieverQueryEngine
+    from docindex import CustomOllamaEmbedding, PooledOllamaLLM, load_or_build_index
+    from retrieval import HybridRetriever
+    # Answers go through the same hosts (OLLAMA_HOST or a host list) as everything else
+    index_llm = PooledOllamaLLM(core_llm)
 
-    # Step 3: Use CustomOllamaEmbedding for embedding
-    embed_model = CustomOllamaEmbedding(model_name="nomic-embed-text")
+    # Step 3: Use CustomOllamaEmbedding for embedding, sharing the LLM's connection pool and hosts
+    embed_model = CustomOllamaEmbedding(model_name="nomic-embed-text", session=core_llm.session,
+                                        balancer=core_llm.balancer)
 
-    # Step 4: Build the vector index
-    print("🔍 Building index...")
-    index = VectorStoreIndex.from_documents(documents, embed_model=embed_model)
+    # Step 4: Load the persisted vector index, re-embedding only changed files
+    print("🔍 Loading index...")
+    index, bm25 = load_or_build_index(docs_path, embed_model)
 
-    # Step 5: Create a query engine
-    query_engine = index.as_query_engine(llm=index_llm)
+    # Step 5: Create a query engine over BM25 + dense hybrid retrieval
+    retriever = HybridRetriever(index, similarity_top_k=5, bm25=bm25)
+    query_engine = RetrieverQueryEngine.from_args(retriever, llm=index_llm)
 
     # Step 6: Interactive Q&A loop
     print("\n✅ Ready! Ask about your documents.")
@@ -71,6 +65,9 @@ def main():
         response = query_engine.query(query)
         print("\n🤖 Answer:")
         print(response)
+        t = retriever.last_timings
+        print(f"\n⏱️ Retrieval {t['total_ms']:.1f} ms (bm25 {t['bm25_ms']:.1f} ms, "
+              f"dense {'%.1f ms' % t['dense_ms'] if t['dense_used'] else 'skipped'})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import shlex
+import zlib
+import sqlite3
+import hashlib
+import argparse
+
+DEFAULT_BACKUP_DIR = "backups"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS edits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    created REAL NOT NULL,
+    instruction TEXT NOT NULL,
+    before_sha TEXT,
+    after_sha TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS edits_by_path ON edits (path, id);
+"""
+
+
+class BackupStore:
+    """Versions of edited files as compressed, content-addressed blobs plus an append-only SQLite log.
+
+    A blob is stored once per distinct content (objects/<sha[:2]>/<sha[2:]>), so re-saving an
+    unchanged file or rolling back costs a log row, not another copy. Rows are never updated;
+    a rollback is recorded as a new edit.
+    """
+
+    def __init__(self, root=DEFAULT_BACKUP_DIR):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        os.makedirs(self.objects, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, "history.db"))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    @staticmethod
+    def key(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    def _blob_path(self, sha: str) -> str:
+        return os.path.join(self.objects, sha[:2], sha[2:])
+
+    def put(self, content: str) -> str:
+        data = content.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(zlib.compress(data, 9))
+            os.replace(path + ".tmp", path)
+        return sha
+
+    def read(self, sha: str) -> str:
+        with open(self._blob_path(sha), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def record(self, path: str, before, after: str, instruction: str) -> int:
+        """Store both versions and log the edit; returns its id."""
+        before_sha = self.put(before) if before is not None else None
+        after_sha = self.put(after)
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO edits (path, created, instruction, before_sha, after_sha, size) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(path), time.time(), instruction, before_sha, after_sha, len(after)),
+            )
+        return cursor.lastrowid
+
+    def history(self, path: str, limit=20) -> list[dict]:
+        rows = self.db.execute(
+            "SELECT id, created, instruction, before_sha, after_sha, size FROM edits WHERE path = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (self.key(path), limit),
+        ).fetchall()
+        return [dict(zip(("id", "created", "instruction", "before_sha", "after_sha", "size"), row)) for row in rows]
+
+    def edit(self, edit_id: int) -> dict:
+        row = self.db.execute(
+            "SELECT id, path, created, instruction, before_sha, after_sha, size FROM edits WHERE id = ?", (edit_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No edit #{edit_id}")
+        return dict(zip(("id", "path", "created", "instruction", "before_sha", "after_sha", "size"), row))
+
+    def files(self) -> list[tuple[str, int]]:
+        return self.db.execute("SELECT path, COUNT(*) FROM edits GROUP BY path ORDER BY path").fetchall()
+
+    def rollback(self, path: str, edit_id=None) -> int:
+        """Restore the file as it was before `edit_id` (default: its latest edit); logged as a new edit."""
+        if edit_id is None:
+            latest = self.history(path, limit=1)
+            if not latest:
+                raise KeyError(f"No history for {path}")
+            edit = latest[0]
+        else:
+            edit = self.edit(edit_id)
+            if edit["path"] != self.key(path):
+                raise KeyError(f"Edit #{edit_id} belongs to {edit['path']}")
+        if edit["before_sha"] is None:
+            raise KeyError(f"Edit #{edit['id']} has no previous version")
+        restored = self.read(edit["before_sha"])
+        try:
+            with open(path, "r") as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        with open(path, "w") as f:
+            f.write(restored)
+        return self.record(path, current, restored, f"rollback to before #{edit['id']}")
+
+    def close(self):
+        self.db.close()
+
+
+def rollback_command(path: str, edit_id=None, root=DEFAULT_BACKUP_DIR) -> str:
+    """Shell command that undoes an edit when run from the current directory."""
+    parts = ["python3", os.path.relpath(os.path.abspath(__file__))]
+    if os.path.abspath(root) != os.path.abspath(DEFAULT_BACKUP_DIR):
+        parts += ["--dir", root]
+    parts += ["rollback", path]
+    if edit_id is not None:
+        parts.append(str(edit_id))
+    return " ".join(shlex.quote(part) for part in parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and roll back files edited by agent.py.")
+    parser.add_argument("--dir", default=DEFAULT_BACKUP_DIR, help="backup directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("files", help="files with recorded edits")
+    history = commands.add_parser("history", help="edits of one file, newest first")
+    history.add_argument("path")
+    history.add_argument("--limit", type=int, default=20)
+    show = commands.add_parser("show", help="print the file as it was after an edit")
+    show.add_argument("edit_id", type=int)
+    rollback = commands.add_parser("rollback", help="restore a file to before an edit (default: the latest)")
+    rollback.add_argument("path")
+    rollback.add_argument("edit_id", type=int, nargs="?")
+    args = parser.parse_args(argv)
+
+    store = BackupStore(args.dir)
+    try:
+        if args.command == "files":
+            for path, count in store.files():
+                print(f"{count:>5}  {os.path.relpath(path)}")
+        elif args.command == "history":
+            for edit in store.history(args.path, args.limit):
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(edit["created"]))
+                print(f"#{edit['id']:<6} {created}  {edit['size']:>7} chars  {edit['instruction']}")
+        elif args.command == "show":
+            print(store.read(store.edit(args.edit_id)["after_sha"]), end="")
+        elif args.command == "rollback":
+            edit_id = store.rollback(args.path, args.edit_id)
+            print(f"⏪ Restored {args.path} (logged as #{edit_id})")
+    except KeyError as e:
+        sys.exit(f"❌ {e.args[0]}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
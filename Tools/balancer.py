@@ -0,0 +1,172 @@
+import hashlib
+import threading
+import requests
+from models import ModelManager, model_matches
+
+STRATEGIES = ("least_outstanding", "affinity")
+# Failures that mean the request never reached a working server, so retrying elsewhere is safe
+FAILOVER_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout)
+
+
+class NoHealthyHost(requests.exceptions.ConnectionError):
+    pass
+
+
+class Backend:
+    def __init__(self, host: str, keep_alive=None):
+        self.host = host
+        self.manager = ModelManager(host, keep_alive=keep_alive)
+        self.outstanding = 0
+        self.healthy = True
+        self.models = None  # names from the last successful probe, None until probed
+        self.failures = 0
+        self.served = 0
+
+    def url(self, path: str) -> str:
+        return f"http://{self.host}{path}"
+
+    def has_model(self, model: str) -> bool:
+        return self.models is None or any(model_matches(model, name) for name in self.models)
+
+    def weight(self, model: str) -> bytes:
+        # Rendezvous hash: each model gets a stable preferred order of hosts
+        return hashlib.sha256(f"{model}@{self.host}".encode("utf-8")).digest()
+
+
+class HostPool:
+    """Routes requests over several Ollama servers.
+
+    `least_outstanding` sends each request to the healthy host with the fewest requests in
+    flight. `affinity` keeps a model on its preferred host (rendezvous hashing) so it stays
+    loaded there, spilling to the least busy host once `affinity_limit` requests are queued.
+    Hosts that don't have the model are only used when none do. A connection failure marks
+    the host down; a background thread re-probes every host's /api/tags every
+    `health_interval` seconds to bring it back and refresh its model list.
+    """
+
+    def __init__(self, hosts, strategy="least_outstanding", keep_alive=None, health_interval=10.0,
+                 affinity_limit=2):
+        if isinstance(hosts, str):
+            hosts = [h.strip() for h in hosts.split(",") if h.strip()]
+        if not hosts:
+            raise ValueError("HostPool needs at least one host")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}; expected one of {STRATEGIES}")
+        self.backends = [Backend(host, keep_alive=keep_alive) for host in hosts]
+        self.strategy = strategy
+        self.health_interval = health_interval
+        self.affinity_limit = affinity_limit
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def primary(self) -> Backend:
+        return self.backends[0]
+
+    def check(self, backend: Backend) -> bool:
+        tags = backend.manager.probe()
+        with self._lock:
+            backend.healthy = tags is not None
+            if tags is not None:
+                backend.models = [m["name"] for m in tags.get("models", [])]
+                backend.failures = 0
+        return backend.healthy
+
+    def check_all(self):
+        for backend in self.backends:
+            self.check(backend)
+
+    def _health_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            self.check_all()
+
+    def _start_health_checks(self):
+        if len(self.backends) > 1 and self._health_thread is None and self.health_interval:
+            self._health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self._health_thread.start()
+
+    def _pick(self, model: str, exclude) -> Backend:
+        candidates = [b for b in self.backends if b.healthy and b.host not in exclude]
+        with_model = [b for b in candidates if b.has_model(model)] if model else candidates
+        candidates = with_model or candidates
+        if not candidates:
+            return None
+        if self.strategy == "affinity" and model:
+            ranked = sorted(candidates, key=lambda b: b.weight(model), reverse=True)
+            for backend in ranked:
+                if backend.outstanding < self.affinity_limit:
+                    return backend
+            return min(ranked, key=lambda b: b.outstanding)
+        return min(candidates, key=lambda b: (b.outstanding, b.weight(model or "")))
+
+    def acquire(self, model=None, exclude=()) -> Backend:
+        """Reserve a host for one request; pair every acquire with release()."""
+        if len(self.backends) == 1:
+            backend = self.primary
+            with self._lock:
+                backend.outstanding += 1
+            return backend
+
+        self._start_health_checks()
+        for attempt in range(2):
+            with self._lock:
+                backend = self._pick(model, exclude)
+                if backend is not None:
+                    backend.outstanding += 1
+                    return backend
+            if attempt == 0:
+                # Everything we may use looks down; re-probe once before giving up
+                for b in self.backends:
+                    if b.host not in exclude:
+                        self.check(b)
+        raise NoHealthyHost(f"No reachable Ollama host among {', '.join(b.host for b in self.backends)}")
+
+    def release(self, backend: Backend, failed=False):
+        with self._lock:
+            backend.outstanding -= 1
+            if not failed:
+                backend.served += 1
+            else:
+                backend.failures += 1
+                if len(self.backends) > 1:
+                    backend.healthy = False
+
+    def request(self, method: str, path: str, session, model=None, **kwargs):
+        """Send one non-streaming request, failing over to other hosts on connection errors."""
+        tried = set()
+        while True:
+            backend = self.acquire(model, exclude=tried)
+            try:
+                response = session.request(method, backend.url(path), **kwargs)
+            except FAILOVER_ERRORS:
+                self.release(backend, failed=True)
+                tried.add(backend.host)
+                if len(tried) >= len(self.backends):
+                    raise
+                continue
+            self.release(backend)
+            return response
+
+    def preload(self, model: str):
+        """Load `model` on the host its requests would be routed to, not on every host."""
+        if len(self.backends) == 1:
+            self.primary.manager.preload(model)
+            return
+
+        def load():
+            self.check_all()
+            with self._lock:
+                backend = self._pick(model, ())
+            if backend is not None and backend.has_model(model):
+                backend.manager.preload(model, background=False)
+
+        threading.Thread(target=load, name=f"preload-{model}", daemon=True).start()
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [{"host": b.host, "healthy": b.healthy, "outstanding": b.outstanding, "served": b.served,
+                     "failures": b.failures} for b in self.backends]
+
+    def close(self):
+        self._stopped.set()
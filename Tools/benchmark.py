@@ -0,0 +1,248 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+import builtins
+import subprocess
+from mock_ollama import MockOllama
+from llm import LLM
+from embeddings import OllamaEmbedder
+from startup import preimport, run_in_process
+
+BENCH_PURPOSE = "Get the current date and print whether it's a weekday or weekend"
+BENCH_CODE = "import datetime\n\nprint(datetime.date.today())\n"
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+STARTUP_TOOLS = ("message.py", "askdocs.py")
+# Runs a tool in a fresh interpreter and reports the seconds from launch (argv[2]) to its first input()
+FIRST_PROMPT_STUB = """
+import os, sys, time, builtins, runpy
+launched = float(sys.argv[2])
+def first_prompt(prompt=""):
+    print("FIRST_PROMPT", time.time() - launched, flush=True)
+    os._exit(0)
+builtins.input = first_prompt
+sys.path.insert(0, os.path.dirname(sys.argv[1]))
+sys.argv = sys.argv[1:2]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def summarize(name: str, timings: list[float], requests, items=None) -> dict:
+    total = sum(timings)
+    ordered = sorted(timings)
+    return {
+        "stage": name,
+        "runs": len(timings),
+        "total_s": total,
+        "mean_ms": statistics.mean(timings) * 1000 if timings else 0.0,
+        "p50_ms": ordered[len(ordered) // 2] * 1000 if ordered else 0.0,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000 if ordered else 0.0,
+        "requests": dict(requests),
+        "requests_per_s": sum(requests.values()) / total if total else 0.0,
+        "items_per_s": (items / total) if items and total else None,
+    }
+
+
+def timed_runs(runs: int, fn) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_evolve(mock: MockOllama, runs: int, beam_width=1) -> dict:
+    llm = LLM(host=mock.host, model=mock.models[0], cache=False)
+    mock.reset_counts()
+    timings = timed_runs(runs, lambda: llm.evolve_script(
+        BENCH_PURPOSE, max_iterations=3, save=False, ask_to_run=False, beam_width=beam_width, reuse=False))
+    llm.close()
+    name = "evolve_script" if beam_width == 1 else f"evolve_script[beam={beam_width}]"
+    return summarize(name, timings, mock.reset_counts())
+
+
+def bench_evolve_converged(mock: MockOllama, runs: int) -> dict:
+    """Output never verifies and every edit reproduces the same code: should stop early, not at max_iterations."""
+    llm = LLM(host=mock.host, model=mock.models[0], cache=False)
+    mock.verify_answer = "no"
+    mock.reset_counts()
+    try:
+        timings = timed_runs(runs, lambda: llm.evolve_script(
+            BENCH_PURPOSE, max_iterations=10, save=False, ask_to_run=False, reuse=False))
+        return summarize("evolve_script[converged]", timings, mock.reset_counts())
+    finally:
+        mock.verify_answer = "yes"
+        llm.close()
+
+
+def bench_evolve_reuse(mock: MockOllama, runs: int) -> dict:
+    """Repeated purpose answered from a previously verified script in the library."""
+    workdir = tempfile.mkdtemp(prefix="evolve_reuse_bench_")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    llm = LLM(host=mock.host, model=mock.models[0], cache=False)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            llm.evolve_script(BENCH_PURPOSE, max_iterations=3, ask_to_run=False)
+        mock.reset_counts()
+        timings = timed_runs(runs, lambda: llm.evolve_script(BENCH_PURPOSE, max_iterations=3, ask_to_run=False))
+        return summarize("evolve_script[reuse]", timings, mock.reset_counts())
+    finally:
+        llm.close()
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_apply_suggestion(mock: MockOllama, runs: int) -> dict:
+    llm = LLM(host=mock.host, model=mock.models[0], cache=False)
+    mock.reset_counts()
+    timings = timed_runs(runs, lambda: llm.apply_suggestion(BENCH_CODE, "Add a main() function."))
+    llm.close()
+    return summarize("apply_suggestion", timings, mock.reset_counts())
+
+
+def bench_embed(mock: MockOllama, runs: int, chunks: int) -> dict:
+    texts = [f"Paragraph {i}: the student parliament meets every second week." for i in range(chunks)]
+    embedder = OllamaEmbedder(host=f"http://{mock.host}", cache=False)
+    mock.reset_counts()
+    timings = timed_runs(runs, lambda: embedder.embed(texts))
+    embedder.close()
+    return summarize("embed", timings, mock.reset_counts(), items=chunks * runs)
+
+
+def bench_askdocs_index(mock: MockOllama, runs: int, chunks: int) -> dict:
+    """Cold index build of a synthetic docs folder through askdocs' persistence path."""
+    import docindex
+
+    workdir = tempfile.mkdtemp(prefix="askdocs_bench_")
+    docs_path = os.path.join(workdir, "docs")
+    os.makedirs(docs_path)
+    for i in range(chunks):
+        with open(os.path.join(docs_path, f"section_{i}.txt"), "w") as f:
+            f.write(f"Section {i}. " + "The student parliament elects its board every spring. " * 40)
+
+    embed_model = docindex.CustomOllamaEmbedding(host=f"http://{mock.host}", cache=False)
+
+    def build():
+        shutil.rmtree(os.path.join(workdir, "index"), ignore_errors=True)
+        docindex.load_or_build_index(docs_path, embed_model, os.path.join(workdir, "index"))
+
+    try:
+        mock.reset_counts()
+        timings = timed_runs(runs, build)
+        return summarize("askdocs_index", timings, mock.reset_counts(), items=chunks * runs)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class _FirstPrompt(SystemExit):
+    pass
+
+
+def time_to_first_prompt_in_process(path: str) -> float:
+    """Seconds from dispatching `path` the way run.py does until the tool first asks for input."""
+    reached = []
+    original_input = builtins.input
+
+    def first_prompt(prompt=""):
+        reached.append(time.perf_counter())
+        raise _FirstPrompt(0)
+
+    builtins.input = first_prompt
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_in_process(path)
+    finally:
+        builtins.input = original_input
+    return reached[0] - start if reached else time.perf_counter() - start
+
+
+def time_to_first_prompt_subprocess(path: str, env: dict) -> float:
+    """Seconds from launching `python3 path` (the old run.py dispatch) until its first input()."""
+    result = subprocess.run(["python3", "-c", FIRST_PROMPT_STUB, path, repr(time.time())],
+                            capture_output=True, text=True, env=env, timeout=60)
+    for line in result.stdout.splitlines():
+        if line.startswith("FIRST_PROMPT "):
+            return float(line.split()[1])
+    raise RuntimeError(f"{os.path.basename(path)} never asked for input: {result.stderr.strip()[-300:]}")
+
+
+def bench_startup(mock: MockOllama, runs: int, tools=STARTUP_TOOLS) -> list[dict]:
+    """Menu selection to first prompt: a fresh interpreter per tool versus run.py's warm in-process dispatch."""
+    env = dict(os.environ, OLLAMA_HOST=mock.host)
+    previous_host = os.environ.get("OLLAMA_HOST")
+    os.environ["OLLAMA_HOST"] = mock.host
+    preimport("llm", "docindex", "retrieval", "llama_index.core.query_engine").join()
+    results = []
+    try:
+        for tool in tools:
+            path = os.path.join(TOOLS_DIR, tool)
+            mock.reset_counts()
+            cold = [time_to_first_prompt_subprocess(path, env) for _ in range(runs)]
+            results.append(summarize(f"startup_subprocess[{tool}]", cold, mock.reset_counts()))
+            warm = [time_to_first_prompt_in_process(path) for _ in range(runs)]
+            results.append(summarize(f"startup_in_process[{tool}]", warm, mock.reset_counts()))
+    finally:
+        if previous_host is None:
+            os.environ.pop("OLLAMA_HOST", None)
+        else:
+            os.environ["OLLAMA_HOST"] = previous_host
+    return results
+
+
+def print_report(results: list[dict]):
+    print(f"\n{'stage':<34}{'runs':>6}{'mean ms':>11}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>9}  requests")
+    print("-" * 108)
+    for r in results:
+        requests = ", ".join(f"{path}={count}" for path, count in sorted(r["requests"].items()))
+        print(f"{r['stage']:<34}{r['runs']:>6}{r['mean_ms']:>11.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['requests_per_s']:>9.1f}  {requests}")
+        if r["items_per_s"]:
+            print(f"{'':<34}throughput: {r['items_per_s']:.1f} items/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the evolve and askdocs pipelines against a mock Ollama server.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the mock adds to every POST")
+    parser.add_argument("--tokens-per-sec", type=float, default=500, help="mock token streaming rate")
+    parser.add_argument("--chunks", type=int, default=64, help="texts per embedding/indexing run")
+    parser.add_argument("--beam-width", type=int, default=2)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with MockOllama(latency=args.latency, tokens_per_sec=args.tokens_per_sec) as mock:
+        print(f"🧪 Mock Ollama on {mock.host} (latency {args.latency}s, {args.tokens_per_sec} tok/s)")
+        results.append(bench_evolve(mock, args.runs))
+        if args.beam_width > 1:
+            results.append(bench_evolve(mock, args.runs, beam_width=args.beam_width))
+        results.append(bench_evolve_converged(mock, args.runs))
+        results.append(bench_evolve_reuse(mock, args.runs))
+        results.append(bench_apply_suggestion(mock, args.runs))
+        results.append(bench_embed(mock, args.runs, args.chunks))
+        try:
+            results.append(bench_askdocs_index(mock, args.runs, args.chunks))
+        except ImportError as e:
+            print(f"⚠️ Skipping askdocs_index stage: {e}")
+        results.extend(bench_startup(mock, args.runs))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = ".llm_cache"
+
+
+def make_key(*parts) -> str:
+    """Content-address a request: the same parts always hash to the same key."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk JSON cache with LRU eviction by entry count and total size, plus a TTL.
+
+    Each entry is one file named after its key, so the cache survives restarts and can be
+    shared by every tool that runs from the same working directory.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_entries=2000, max_bytes=64 * 1024 * 1024,
+                 ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        found = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _drop(self, key: str):
+        self._total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                self._drop(key)
+                self.misses += 1
+                return None
+            if self.ttl and time.time() - record["created"] > self.ttl:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            os.utime(self._path(key))  # file mtime tracks recency across restarts
+            self.hits += 1
+            return record["value"]
+
+    def set(self, key: str, value):
+        data = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False)
+        with self._lock:
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data.encode("utf-8"))
+            self._total_bytes += self._entries[key]
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+        }
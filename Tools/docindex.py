@@ -0,0 +1,208 @@
+import os
+import json
+import hashlib
+from typing import List, Tuple
+from llama_index.core import VectorStoreIndex, StorageContext, load_index_from_storage
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.constants import DEFAULT_CONTEXT_WINDOW
+from llama_index.core.llms import CustomLLM, CompletionResponse, CompletionResponseGen, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llm import DEFAULT_TIMEOUT
+from embeddings import OllamaEmbedder
+from ingest import IngestPipeline
+from retrieval import BM25Index
+
+
+class CustomOllamaEmbedding(BaseEmbedding):
+    _embedder: OllamaEmbedder = PrivateAttr()
+
+    def __init__(self, model_name="nomic-embed-text", host="http://localhost:11434", session=None,
+                 timeout=DEFAULT_TIMEOUT, batch_size=32, max_workers=4, cache=True, balancer=None, **kwargs):
+        super().__init__(model_name=model_name, embed_batch_size=batch_size, **kwargs)
+        self._embedder = OllamaEmbedder(model_name=model_name, host=host, session=session, timeout=timeout,
+                                        batch_size=batch_size, max_workers=max_workers, cache=cache,
+                                        balancer=balancer)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        return self._embedder.embed(texts)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    # BaseEmbedding hooks; get_text_embedding_batch hands us embed_batch_size texts at a time
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self.embed_query(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self.embed_query(query)
+
+
+class PooledOllamaLLM(CustomLLM):
+    """llama_index LLM that answers through an llm.LLM, so queries share its hosts, cache and metrics."""
+    _llm: object = PrivateAttr()
+
+    def __init__(self, llm, **kwargs):
+        super().__init__(**kwargs)
+        self._llm = llm
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name=self._llm.model,
+                           context_window=self._llm.options.get("num_ctx", DEFAULT_CONTEXT_WINDOW))
+
+    @staticmethod
+    def _messages(prompt: str) -> list[dict]:
+        # llama_index's QA prompt carries its own instructions; the coding system prompt doesn't apply
+        return [{"role": "user", "content": prompt}]
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        return CompletionResponse(text=self._llm._chat_messages(self._messages(prompt)))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponseGen:
+        def generate():
+            text = ""
+            for token in self._llm.stream_messages(self._messages(prompt)):
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+        return generate()
+
+
+PERSIST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".askdocs_index")
+MANIFEST_FILE = "manifest.json"
+BM25_FILE = "bm25.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_doc_files(docs_path: str) -> List[str]:
+    files = []
+    for root, _, names in os.walk(docs_path):
+        files.extend(os.path.join(root, name) for name in names if not name.startswith("."))
+    return sorted(files)
+
+
+def load_manifest(persist_dir: str) -> dict:
+    try:
+        with open(os.path.join(persist_dir, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(persist_dir: str, manifest: dict):
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def diff_doc_files(docs_path: str, files: dict):
+    """Compare the docs folder with the manifest's file entries.
+
+    Returns (changed, deleted, unchanged). mtime+size is the fast path; a file whose stat
+    changed but whose content hash did not (e.g. touched or copied) is not re-embedded.
+    """
+    changed, unchanged = [], {}
+    current = set()
+    for path in list_doc_files(docs_path):
+        rel = os.path.relpath(path, docs_path)
+        current.add(rel)
+        stat = os.stat(path)
+        entry = files.get(rel)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            unchanged[rel] = entry
+            continue
+        sha = file_sha256(path)
+        if entry and entry["sha256"] == sha:
+            unchanged[rel] = dict(entry, mtime=stat.st_mtime, size=stat.st_size)
+        else:
+            changed.append((rel, {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": sha}))
+    deleted = [rel for rel in files if rel not in current]
+    return changed, deleted, unchanged
+
+
+def ref_doc_node_ids(index: VectorStoreIndex, doc_ids) -> List[str]:
+    node_ids = []
+    for doc_id in doc_ids:
+        info = index.docstore.get_ref_doc_info(doc_id)
+        if info is not None:
+            node_ids.extend(info.node_ids)
+    return node_ids
+
+
+def load_keyword_index(index: VectorStoreIndex, persist_dir: str) -> BM25Index:
+    """The persisted BM25 index, or one rebuilt from the docstore if it is missing or damaged."""
+    try:
+        return BM25Index.load(os.path.join(persist_dir, BM25_FILE))
+    except (OSError, ValueError):
+        return BM25Index.from_nodes(index.docstore.docs.values())
+
+
+def load_or_build_index(docs_path: str, embed_model, persist_dir=PERSIST_DIR) -> Tuple[VectorStoreIndex, BM25Index]:
+    """Load the persisted vector and BM25 indexes and update both only for files that were added,
+    changed or deleted. Returns (vector_index, bm25_index)."""
+    manifest = load_manifest(persist_dir)
+    files = manifest.get("files", {})
+    index = None
+    if manifest.get("embed_model") == embed_model.model_name and files:
+        try:
+            storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+            index = load_index_from_storage(storage_context, embed_model=embed_model)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load persisted index, rebuilding: {e}")
+    if index is None:
+        index = VectorStoreIndex([], embed_model=embed_model)
+        files = {}
+        bm25 = BM25Index()
+        bm25_stale = True
+    else:
+        bm25 = load_keyword_index(index, persist_dir)
+        bm25_stale = not os.path.exists(os.path.join(persist_dir, BM25_FILE))
+
+    changed, deleted, unchanged = diff_doc_files(docs_path, files)
+    for rel in deleted + [rel for rel, _ in changed if rel in files]:
+        bm25.remove(ref_doc_node_ids(index, files[rel]["doc_ids"]))
+        for doc_id in files[rel]["doc_ids"]:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+
+    errors = {}
+    if changed:
+        print(f"🧩 Embedding {len(changed)} changed file(s)...")
+        pipeline = IngestPipeline(index, embed_model)
+        doc_ids, errors = pipeline.run([(rel, os.path.join(docs_path, rel)) for rel, _ in changed],
+                                       progress=lambda n: print(f"\r🧩 {n} chunks indexed", end="", flush=True))
+        print()
+        for rel, entry in changed:
+            if rel in errors:
+                print(f"⚠️ Skipped {rel}: {errors[rel]}")
+            else:
+                unchanged[rel] = dict(entry, doc_ids=doc_ids[rel])
+                for node_id in ref_doc_node_ids(index, doc_ids[rel]):
+                    bm25.add(node_id, index.docstore.get_node(node_id).get_content())
+
+    if changed or deleted or unchanged != files:
+        index.storage_context.persist(persist_dir=persist_dir)
+        save_manifest(persist_dir, {"embed_model": embed_model.model_name, "files": unchanged})
+    if changed or deleted or bm25_stale:
+        bm25.save(os.path.join(persist_dir, BM25_FILE))
+    print(f"📚 Index ready: {len(unchanged)} files, {len(changed) - len(errors)} re-embedded, {len(deleted)} removed.")
+    return index, bm25
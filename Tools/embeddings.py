@@ -0,0 +1,142 @@
+import os
+import asyncio
+import hashlib
+import threading
+import requests
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from cache import DEFAULT_CACHE_DIR, ResponseCache, make_key
+from llm import DEFAULT_TIMEOUT, create_session
+
+EMBED_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "embeddings")
+
+
+def _is_model_not_found(body) -> bool:
+    """Ollama reports an unpulled model as a 404 with a JSON error naming the model."""
+    error = str(body.get("error", "") if isinstance(body, dict) else "").lower()
+    return "model" in error and "not found" in error
+
+
+def _json_or_none(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def _raise_for_status(status: int, body, url: str):
+    if status >= 400:
+        raise requests.exceptions.HTTPError(f"{status} Error: {body} for url: {url}")
+
+
+class OllamaEmbedder:
+    """Embeds texts against Ollama in batches.
+
+    Uses the multi-input /api/embed endpoint when the server has it and falls back to concurrent
+    single-text /api/embeddings calls on older servers. Identical texts are embedded once, and
+    vectors are cached on disk by (model, text hash). aembed() is the asyncio variant LLM.aembed uses.
+    """
+
+    def __init__(self, model_name="nomic-embed-text", host="http://localhost:11434", session=None,
+                 timeout=DEFAULT_TIMEOUT, batch_size=32, max_workers=4, cache=True, balancer=None):
+        self.model_name = model_name
+        self.host = host
+        # A HostPool (e.g. LLM.balancer) spreads batches over several servers instead of `host`
+        self.balancer = balancer
+        self.session = session or create_session(pool_size=max_workers)
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.cache = ResponseCache(EMBED_CACHE_DIR, max_entries=50000, max_bytes=512 * 1024 * 1024) if cache is True else (cache or None)
+        self._batch_supported = None  # unknown until the first /api/embed call
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _cache_key(self, text: str) -> str:
+        return make_key("embed", self.model_name, hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+    def _post(self, path: str, payload: dict):
+        if self.balancer is not None:
+            return self.balancer.request("POST", path, self.session, model=self.model_name, json=payload,
+                                         timeout=self.timeout)
+        return self.session.post(f"{self.host}{path}", json=payload, timeout=self.timeout)
+
+    def _embed_single(self, text: str) -> List[float]:
+        response = self._post("/api/embeddings", {"model": self.model_name, "prompt": text})
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+    def _embed_pooled(self, texts: List[str]) -> List[List[float]]:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        return list(self._pool.map(self._embed_single, texts))
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self._batch_supported is not False:
+            response = self._post("/api/embed", {"model": self.model_name, "input": texts})
+            # Servers without /api/embed answer 404 too, but a missing model must not disable batching for good
+            if response.status_code == 404 and not _is_model_not_found(_json_or_none(response)):
+                self._batch_supported = False
+            else:
+                response.raise_for_status()
+                self._batch_supported = True
+                return response.json()["embeddings"]
+        return self._embed_pooled(texts)
+
+    def _lookup(self, texts: List[str]):
+        """({text: cached vector}, [unique texts still to embed])."""
+        vectors = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            cached = self.cache.get(self._cache_key(text)) if self.cache is not None else None
+            if cached is not None:
+                vectors[text] = cached
+            else:
+                missing.append(text)
+        return vectors, missing
+
+    def _store(self, vectors: dict, batch: List[str], embedded: List[List[float]]):
+        for text, vector in zip(batch, embedded):
+            vectors[text] = vector
+            if self.cache is not None:
+                self.cache.set(self._cache_key(text), vector)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts)
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            self._store(vectors, batch, self._embed_batch(batch))
+        return [vectors[text] for text in texts]
+
+    async def _aembed_single(self, text: str, post) -> List[float]:
+        status, body = await post("/api/embeddings", {"model": self.model_name, "prompt": text})
+        _raise_for_status(status, body, "/api/embeddings")
+        return body["embedding"]
+
+    async def _aembed_batch(self, texts: List[str], post) -> List[List[float]]:
+        if self._batch_supported is not False:
+            status, body = await post("/api/embed", {"model": self.model_name, "input": texts})
+            if status == 404 and not _is_model_not_found(body):
+                self._batch_supported = False
+            else:
+                _raise_for_status(status, body, "/api/embed")
+                self._batch_supported = True
+                return body["embeddings"]
+        return list(await asyncio.gather(*(self._aembed_single(text, post) for text in texts)))
+
+    async def aembed(self, texts: List[str], post) -> List[List[float]]:
+        """Async embed(); `post(path, payload)` awaits (status, body), e.g. LLM._apost via LLM.aembed.
+
+        All batches are requested at once; the caller's post bounds how many are in flight.
+        """
+        vectors, missing = self._lookup(texts)
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        for batch, embedded in zip(batches, await asyncio.gather(*(self._aembed_batch(b, post) for b in batches))):
+            self._store(vectors, batch, embedded)
+        return [vectors[text] for text in texts]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
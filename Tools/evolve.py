@@ -1,6 +1,184 @@
+import sys
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from llm import LLM  # assuming LLM class is in llm.py
+from cache import make_key
+
+
+def read_purposes(path: str) -> list[dict]:
+    """Read purposes from a JSONL file (or '-' for stdin).
+
+    Each line is either a JSON object with a "purpose" (and optional "id") or a plain string.
+    Items without an id get a stable one derived from the purpose so resumes can match them.
+    """
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    items = []
+    try:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = line
+            if isinstance(item, str):
+                item = {"purpose": item}
+            item.setdefault("id", make_key("purpose", item["purpose"])[:12])
+            items.append(item)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return items
+
+
+def completed_ids(output_path: str) -> set:
+    """Ids already present in the output file; the output doubles as the resume checkpoint."""
+    done = set()
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["id"])
+                except (ValueError, KeyError):
+                    continue  # a partially written last line from an interrupted run
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def terminate_partial_line(path: str):
+    """End a line cut off by an interrupted run so appended records start on their own line."""
+    try:
+        with open(path, "rb+") as f:
+            if f.seek(0, 2) == 0:
+                return
+            f.seek(-1, 2)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+
+def run_one(llm: LLM, item: dict, args, cancel=None) -> dict:
+    record = {"id": item["id"], "purpose": item["purpose"]}
+    try:
+        result = llm.evolve_script(
+            item["purpose"],
+            max_iterations=args.max_iterations,
+            max_fixes=args.max_fixes,
+            save=args.save,
+            beam_width=args.beam_width,
+            reuse=args.reuse,
+            token_budget=args.token_budget,
+            time_budget=args.time_budget,
+            cancel=cancel,
+            ask_to_run=False,
+            verbose=False,
+        )
+        record.update(
+            success=result["success"],
+            verified=result["verified"],
+            iterations=result["iterations"],
+            stopped=result["stopped"],
+            elapsed_s=round(result["elapsed_s"], 3),
+            path=result["path"],
+            reused=bool(result.get("reused")),
+            code=result["code"],
+            metrics=result["metrics"],
+        )
+    except Exception as e:
+        record.update(success=False, error=f"{type(e).__name__}: {e}")
+    return record
+
+
+def run_batch(args):
+    items = read_purposes(args.batch)
+    done = completed_ids(args.output)
+    pending = [item for item in items if item["id"] not in done]
+    print(f"📋 {len(items)} purposes, {len(items) - len(pending)} already done, {len(pending)} to run "
+          f"with concurrency {args.concurrency}")
+    if not pending:
+        return
+
+    llm = LLM(host=args.host, model=args.model, pool_size=max(10, args.concurrency), strategy=args.strategy,
+              cache=args.cache)
+    finished = 0
+    terminate_partial_line(args.output)
+    cancel = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=args.concurrency)
+    try:
+        with open(args.output, "a", encoding="utf-8") as out:
+            def write(record):
+                nonlocal finished
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                finished += 1
+                status = "✅" if record.get("verified") else ("⚠️" if record.get("success") else "❌")
+                print(f"{status} [{finished}/{len(pending)}] {record['id']} {record.get('elapsed_s', '-')}s  {record['purpose'][:60]}")
+
+            futures = {pool.submit(run_one, llm, item, args, cancel) for item in pending}
+            try:
+                for future in as_completed(futures):
+                    futures.discard(future)
+                    write(future.result())
+            except KeyboardInterrupt:
+                # Drop queued purposes and ask running ones to stop after their current model call
+                cancel.set()
+                pool.shutdown(wait=False, cancel_futures=True)
+                running = {f for f in futures if not f.cancelled()}
+                print(f"\n⏹️ Interrupted; waiting for {len(running)} running purpose(s) to stop "
+                      "(Ctrl+C again to quit now)...")
+                for future in as_completed(running):
+                    record = future.result()
+                    # Cancelled runs are left out of the results so a resume evolves them again
+                    if record.get("stopped") != "cancelled":
+                        write(record)
+                print(f"⏹️ Stopped after {finished}/{len(pending)}; rerun the same command to resume.")
+                sys.exit(130)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        llm.close()
+    print(f"💾 Results written to {args.output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Evolve a Python script for a purpose, or a batch of purposes.")
+    parser.add_argument("--batch", metavar="FILE", help="JSONL file of purposes to process unattended ('-' for stdin)")
+    parser.add_argument("--output", default="evolve_results.jsonl", help="JSONL results file, also used to resume")
+    parser.add_argument("--concurrency", type=int, default=2, help="purposes evolved at the same time")
+    parser.add_argument("--model", help="Ollama model to use (required with --batch -)")
+    parser.add_argument("--host", help="Ollama host, or several separated by commas (default: OLLAMA_HOST or localhost:11434)")
+    parser.add_argument("--strategy", default="least_outstanding", choices=("least_outstanding", "affinity"),
+                        help="how requests are spread over several hosts")
+    parser.add_argument("--max-iterations", type=int, default=10)
+    parser.add_argument("--max-fixes", type=int, default=3)
+    parser.add_argument("--beam-width", type=int, default=1)
+    parser.add_argument("--no-save", dest="save", action="store_false", help="don't write evolved_scripts/")
+    parser.add_argument("--no-reuse", dest="reuse", action="store_false",
+                        help="always evolve from scratch instead of reusing similar verified scripts")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="ask the model again instead of replaying cached responses (e.g. to retry a failed purpose)")
+    parser.add_argument("--token-budget", type=int, help="stop after this many prompt + response tokens per purpose")
+    parser.add_argument("--time-budget", type=float, help="stop after this many seconds per purpose")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    purpose = input("📝 What is the purpose of this script?\n> ")
-    llm = LLM()
-    llm.evolve_script(purpose)
+    args = parse_args()
+    if args.batch:
+        if args.batch == "-" and not args.model:
+            sys.exit("❌ --model is required when reading purposes from stdin.")
+        run_batch(args)
+    else:
+        # Choose the model first so it preloads while the purpose is being typed
+        llm = LLM(host=args.host, model=args.model, strategy=args.strategy, cache=args.cache)
+        try:
+            purpose = input("📝 What is the purpose of this script?\n> ")
+            llm.evolve_script(purpose, max_iterations=args.max_iterations, max_fixes=args.max_fixes,
+                              save=args.save, beam_width=args.beam_width, reuse=args.reuse,
+                              token_budget=args.token_budget, time_budget=args.time_budget)
+        finally:
+            llm.close()
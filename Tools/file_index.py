@@ -0,0 +1,126 @@
+import os
+import fnmatch
+import threading
+
+DEFAULT_IGNORED_DIRS = {
+    ".git", "__pycache__", "backups", "node_modules", ".venv", "venv", "env", ".tox", ".nox",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".llm_cache", ".askdocs_index", "site-packages",
+}
+
+
+def load_gitignore(root: str) -> list[tuple[str, bool, bool]]:
+    """Parse root .gitignore into (pattern, anchored, dir_only) tuples; negations are not supported."""
+    patterns = []
+    try:
+        with open(os.path.join(root, ".gitignore"), "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith(("#", "!")):
+                    continue
+                dir_only = line.endswith("/")
+                line = line.rstrip("/")
+                anchored = line.startswith("/") or "/" in line
+                patterns.append((line.lstrip("/"), anchored, dir_only))
+    except OSError:
+        pass
+    return patterns
+
+
+class FileIndex:
+    """Cached listing of matching files under `root`.
+
+    Each directory's listing is cached together with its mtime. A refresh stats every
+    directory but only re-lists the ones whose mtime changed (entries added, removed or
+    renamed), so redrawing a menu costs little on large checkouts.
+    """
+
+    def __init__(self, root=".", suffix=".py", ignored_dirs=DEFAULT_IGNORED_DIRS, use_gitignore=True):
+        self.root = root
+        self.suffix = suffix
+        self.ignored_dirs = set(ignored_dirs)
+        self.gitignore = load_gitignore(root) if use_gitignore else []
+        self._dirs = {}  # path -> (mtime_ns, files, subdirs)
+        self._lock = threading.Lock()
+        self.last_rescanned = 0
+
+    def _gitignored(self, path: str, name: str, is_dir: bool) -> bool:
+        rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+        for pattern, anchored, dir_only in self.gitignore:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch.fnmatch(rel if anchored else name, pattern):
+                return True
+        return False
+
+    def _wanted_dir(self, path: str, name: str) -> bool:
+        if name in self.ignored_dirs or name.endswith(".egg-info"):
+            return False
+        if os.path.exists(os.path.join(path, "pyvenv.cfg")):
+            return False  # a virtualenv under any name
+        return not self._gitignored(path, name, True)
+
+    def _wanted_file(self, path: str, name: str) -> bool:
+        return name.endswith(self.suffix) and not name.startswith("__") and not self._gitignored(path, name, False)
+
+    def _scan(self, path: str):
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if self._wanted_dir(entry.path, entry.name):
+                        subdirs.append(entry.path)
+                elif entry.is_file() and self._wanted_file(entry.path, entry.name):
+                    files.append(entry.path)
+        return sorted(files), sorted(subdirs)
+
+    def refresh(self):
+        with self._lock:
+            seen = {}
+            rescanned = 0
+            stack = [self.root]
+            while stack:
+                path = stack.pop()
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                cached = self._dirs.get(path)
+                if cached is None or cached[0] != mtime:
+                    try:
+                        files, subdirs = self._scan(path)
+                    except OSError:
+                        continue
+                    cached = (mtime, files, subdirs)
+                    rescanned += 1
+                seen[path] = cached
+                stack.extend(reversed(cached[2]))
+            self._dirs = seen
+            self.last_rescanned = rescanned
+
+    def files(self, exclude=()) -> list[str]:
+        self.refresh()
+        result = []
+        stack = [self.root]
+        while stack:
+            path = stack.pop()
+            entry = self._dirs.get(path)
+            if entry is None:
+                continue
+            result.extend(f for f in entry[1] if os.path.basename(f) not in exclude)
+            stack.extend(reversed(entry[2]))
+        return result
+
+
+_indexes = {}
+
+
+def get_index(root=".", suffix=".py") -> FileIndex:
+    """Shared index per (root, suffix), so repeated menu draws in one process reuse the cache."""
+    key = (os.path.abspath(root), suffix)
+    if key not in _indexes:
+        _indexes[key] = FileIndex(root, suffix=suffix)
+    return _indexes[key]
+
+
+def find_python_files(base_dir=".", exclude=()) -> list[str]:
+    return get_index(base_dir).files(exclude=exclude)
@@ -0,0 +1,146 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llama_index.core import Document, SimpleDirectoryReader
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+
+TEXT_EXTENSIONS = {".txt", ".md", ".rst", ".csv", ".json", ".html", ".htm", ".py", ".yaml", ".yml"}
+TEXT_BLOCK_CHARS = 64 * 1024
+_DONE = object()
+
+
+def iter_pages(path: str):
+    """Yield (page_number, text) one page at a time instead of loading the whole file.
+
+    PDFs are read page by page with pypdf, text files in blocks of about TEXT_BLOCK_CHARS;
+    other formats fall back to SimpleDirectoryReader for that single file.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        from pypdf import PdfReader  # installed with llama-index's file readers
+
+        for number, page in enumerate(PdfReader(path).pages, start=1):
+            yield number, page.extract_text() or ""
+    elif ext in TEXT_EXTENSIONS:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            number, block, size = 1, [], 0
+            for line in f:
+                block.append(line)
+                size += len(line)
+                if size >= TEXT_BLOCK_CHARS:
+                    yield number, "".join(block)
+                    number, block, size = number + 1, [], 0
+            if block:
+                yield number, "".join(block)
+    else:
+        for number, document in enumerate(SimpleDirectoryReader(input_files=[path]).load_data(), start=1):
+            yield number, document.text
+
+
+class IngestPipeline:
+    """Parse -> chunk -> embed -> insert, with bounded queues between the stages.
+
+    Files are parsed and chunked by `parse_workers` threads, one page at a time; a single
+    embedding thread batches chunks from all files, and the caller's thread inserts the
+    embedded nodes (the index is not thread safe). Parsing blocks when `queue_size` chunks
+    are waiting, so memory stays flat however large the docs folder is, and the first
+    embedding request goes out as soon as the first page is chunked.
+    """
+
+    def __init__(self, index, embed_model, parse_workers=4, queue_size=256, embed_batch=32,
+                 chunk_size=1024, chunk_overlap=200):
+        self.index = index
+        self.embed_model = embed_model
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.embed_batch = embed_batch
+        self.splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def _parse_file(self, rel: str, path: str, chunks: queue.Queue, doc_ids: dict, errors: dict, stop):
+        ids = doc_ids[rel] = []
+        try:
+            for number, text in iter_pages(path):
+                if stop.is_set():
+                    return
+                if not text.strip():
+                    continue
+                document = Document(text=text, id_=f"{rel}#{number}",
+                                    metadata={"file_name": os.path.basename(rel), "file_path": rel, "page_label": str(number)})
+                ids.append(document.doc_id)
+                for node in self.splitter.get_nodes_from_documents([document]):
+                    chunks.put(node)
+        except Exception as e:
+            errors[rel] = f"{type(e).__name__}: {e}"
+
+    def _embed_batch(self, batch: list, embedded: queue.Queue):
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+        for node, vector in zip(batch, self.embed_model.get_text_embedding_batch(texts)):
+            node.embedding = vector
+        embedded.put(batch)
+
+    def _embed_stage(self, chunks: queue.Queue, embedded: queue.Queue):
+        batch = []
+        try:
+            while True:
+                node = chunks.get()
+                if node is _DONE:
+                    break
+                batch.append(node)
+                if len(batch) >= self.embed_batch:
+                    self._embed_batch(batch, embedded)
+                    batch = []
+            if batch:
+                self._embed_batch(batch, embedded)
+            embedded.put(_DONE)
+        except Exception as e:
+            embedded.put(e)
+
+    def run(self, files: list[tuple[str, str]], progress=None) -> tuple[dict, dict]:
+        """Index (rel, path) pairs; returns ({rel: doc_ids}, {rel: error}) for the files handled."""
+        chunks = queue.Queue(maxsize=self.queue_size)
+        embedded = queue.Queue(maxsize=max(2, self.queue_size // self.embed_batch))
+        doc_ids, errors = {}, {}
+        stop = threading.Event()
+
+        def parse_all():
+            with ThreadPoolExecutor(max_workers=self.parse_workers) as pool:
+                for rel, path in files:
+                    pool.submit(self._parse_file, rel, path, chunks, doc_ids, errors, stop)
+            chunks.put(_DONE)
+
+        parser = threading.Thread(target=parse_all, name="ingest-parse", daemon=True)
+        embedder = threading.Thread(target=self._embed_stage, args=(chunks, embedded), name="ingest-embed",
+                                    daemon=True)
+        parser.start()
+        embedder.start()
+        inserted = 0
+        try:
+            while True:
+                batch = embedded.get()
+                if batch is _DONE:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                self.index.insert_nodes(batch)
+                inserted += len(batch)
+                if progress:
+                    progress(inserted)
+        except BaseException:
+            # Unblock the producers so the threads can wind down
+            stop.set()
+            while parser.is_alive() or embedder.is_alive():
+                for q in (chunks, embedded):
+                    try:
+                        q.get(timeout=0.05)
+                    except queue.Empty:
+                        pass
+            raise
+        parser.join()
+        embedder.join()
+        # Files that failed part way may have inserted some pages; drop them so a rerun starts clean
+        for rel in errors:
+            for doc_id in doc_ids.pop(rel, []):
+                self.index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        return doc_ids, errors
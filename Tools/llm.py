@@ -1,20 +1,258 @@
 import os
 import re
+import ast
+import hashlib
 import time
+import threading
 import json
+import queue
+import asyncio
+import weakref
 import tempfile
 import traceback
 import subprocess
+import aiohttp
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cache import ResponseCache, make_key
+from sandbox import SandboxPool
+from models import ModelPuller, PROBE_TIMEOUT
+from balancer import HostPool
+from patching import PatchError, apply_unified_diff, relevant_chunks
+from precheck import precheck
+from metrics import Metrics, default_metrics, format_summary, in_context, operation
+
+# (connect, read) timeouts in seconds; the read timeout applies between streamed chunks
+DEFAULT_TIMEOUT = (5, 300)
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+# Retried with exponential backoff (seconds) like the requests session's Retry
+RETRY_STATUSES = (502, 503, 504)
+RETRY_BACKOFF = 0.3
+# Failures before Ollama answered, so the request can safely go to another host
+AIO_FAILOVER_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError,
+                       getattr(aiohttp, "ConnectionTimeoutError", aiohttp.ServerTimeoutError))
+
+DEFAULT_KEEP_ALIVE = "30m"
+SYSTEM_PROMPT = "You are an experienced Python developer. When asked for code, reply with one complete Python code block."
+
+GENERATE_PROMPT = """Write a complete Python script that fulfills the following purpose:\n\n"{purpose}"\n\nReturn only the full code."""
+SUGGESTIONS_PROMPT = """You are an experienced Python developer. Given the following code:\n\n--- CODE ---\n{code}\n\nSuggest 3 improvements or refactorings. Keep them short and numbered."""
+APPLY_PROMPT = """You're a Python coding assistant. Update the code below according to the instruction.\n\n--- INSTRUCTION ---\n{suggestion}\n\n--- ORIGINAL CODE ---\n{code}\n\nRespond with the updated code only."""
+DIFF_PROMPT = """You're a Python coding assistant. Update the code below according to the instruction.\n\n--- INSTRUCTION ---\n{suggestion}\n\n--- ORIGINAL CODE ---\n{code}\n\nRespond only with a unified diff (@@ hunks with 3 lines of unchanged context, lines prefixed by ' ', '-' or '+'). Do not repeat unchanged code outside the hunks and never touch the '# ... omitted ...' marker lines."""
+FIX_PROMPT = """The following Python script causes an error when executed.\n\n--- Code ---\n{code}\n\n--- Error ---\n{error}\n\nFix the error so that the script runs correctly and fulfills the original intent. Return the full updated code only."""
+FIX_FOLLOWUP_PROMPT = """That version still fails with this error:\n\n--- Error ---\n{error}\n\nFix it and return the full updated code only."""
+VERIFY_PROMPT = """The original goal is: \"{purpose}\"\n\nThe script produced this output:\n\n--- Output ---\n{output}\n\nDoes this output fulfill the goal? Answer with only \"yes\" or \"no\"."""
+# Generation caps (Ollama num_predict) per prompt type; code-producing prompts are left uncapped
+NUM_PREDICT = {"verify": 5, "suggestions": 300, "explain": 1024}
+# An unterminated block means the answer was cut off while the model was still thinking
+THINK_BLOCK = re.compile(r"<think>.*?(?:</think>|$)", re.DOTALL)
+EXPLAIN_PROMPT = "I got this Python exception:\n\n{error_details}\n\nCan you explain what it means, and suggest some possible fixes?"
+
+
+def extract_code(response: str) -> str:
+    code_blocks = re.findall(r"```(?:python)?\n(.*?)```", response, re.DOTALL)
+    return code_blocks[0].strip() if code_blocks else response.strip()
+
+
+def parse_suggestions(response: str) -> list[str]:
+    return [line.strip() for line in response.splitlines() if line.strip().startswith(("1.", "2.", "3."))]
+
+
+def strip_thinking(response: str) -> str:
+    """Drop the <think> section reasoning models (deepseek-r1, qwen3, ...) emit before answering."""
+    return THINK_BLOCK.sub("", response).strip()
+
+
+def is_yes(response: str) -> bool:
+    return strip_thinking(response).lstrip("*\"' ").lower().startswith("yes")
+
+
+def is_no(response: str) -> bool:
+    return strip_thinking(response).lstrip("*\"' ").lower().startswith("no")
+
+
+def code_hash(code: str) -> str:
+    """Fingerprint of a code version; formatting and comment-only edits hash the same."""
+    try:
+        normalized = ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError):
+        normalized = "\n".join(line.rstrip() for line in code.strip().splitlines())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class Budget:
+    """Token and wall-clock limits for one evolve_script run.
+
+    Tokens (prompt + response) are read from the run's metrics scope, so calls made on pool
+    threads count too. Setting the optional `cancel` event ends the run the same way. Checked
+    between model calls; a call in flight is never cut off.
+    """
+
+    def __init__(self, summary, max_tokens=None, max_seconds=None, cancel=None):
+        self.summary = summary
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.cancel = cancel
+        self.start = time.perf_counter()
+
+    def exceeded(self):
+        """'cancelled', 'time_budget' or 'token_budget' once the run should stop, else None."""
+        if self.cancel is not None and self.cancel.is_set():
+            return "cancelled"
+        if self.max_seconds is not None and time.perf_counter() - self.start >= self.max_seconds:
+            return "time_budget"
+        if self.max_tokens is not None and self.summary.tokens() >= self.max_tokens:
+            return "token_budget"
+        return None
+
+
+def stats_from_final_frame(final: dict, ttft, total: float) -> dict:
+    """Latency and throughput for one streamed call; Ollama reports durations in nanoseconds."""
+    eval_count = final.get("eval_count", 0)
+    eval_duration = final.get("eval_duration", 0)
+    return {
+        "cached": False,
+        "ttft": ttft,
+        "total": total,
+        "prompt_tokens": final.get("prompt_eval_count", 0),
+        "response_tokens": eval_count,
+        "load_duration": final.get("load_duration", 0) / 1e9,
+        "tokens_per_sec": eval_count / (eval_duration / 1e9) if eval_duration else 0.0,
+    }
+
+
+def format_stats(stats: dict) -> str:
+    if stats.get("cached"):
+        return f"⚡ Cached response in {stats['total'] * 1000:.1f}ms"
+    ttft = f"{stats['ttft']:.2f}s" if stats.get("ttft") is not None else "n/a"
+    return f"⏱️ TTFT {ttft}, total {stats['total']:.2f}s, {stats['response_tokens']} tokens at {stats['tokens_per_sec']:.1f} tok/s"
+
+
+def _stop_message(reason: str) -> str:
+    return {
+        "cancelled": "⏹️ Cancelled. Keeping the best version so far.",
+        "time_budget": "⏰ Time budget used up. Keeping the best version so far.",
+        "token_budget": "🪙 Token budget used up. Keeping the best version so far.",
+        "converged": "⏹️ Every suggestion leads back to a version already tried. Stopping.",
+        "unfixable": "💥 Could not fix the script after multiple attempts.",
+    }[reason]
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def print_token(token: str):
+    print(token, end="", flush=True)
+
+
+def _as_requests_error(error: Exception) -> requests.exceptions.RequestException:
+    """The requests exception sync callers already handle, for an aiohttp or asyncio error."""
+    if isinstance(error, asyncio.TimeoutError):
+        return requests.exceptions.Timeout(str(error) or "timed out")
+    return requests.exceptions.ConnectionError(str(error))
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop on a daemon thread that runs the async request path for the sync methods."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-asyncio", daemon=True).start()
+        return _loop
+
+
+def default_host() -> str:
+    """OLLAMA_HOST, as understood by the ollama CLI, or the local default; any scheme is dropped."""
+    host = os.environ.get("OLLAMA_HOST") or "localhost:11434"
+    return host.split("://", 1)[-1].rstrip("/")
+
+
+def create_session(pool_size=10, retries=3, backoff_factor=0.3) -> requests.Session:
+    """Build a keep-alive session with a connection pool and retry/backoff on transient failures."""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 class LLM:
-    def __init__(self, host="localhost:11434", model=None):
-        self.host = host
+    def __init__(self, host=None, model=None, session=None, timeout=DEFAULT_TIMEOUT,
+                 pool_size=10, retries=3, cache=True, sandbox=True, keep_alive=DEFAULT_KEEP_ALIVE,
+                 system=SYSTEM_PROMPT, options=None, num_ctx=None, num_predict=None, preload=True, metrics=None,
+                 strategy="least_outstanding", static_check=True, num_predict_limits=None, max_concurrency=None):
+        # host may be a list (or comma-separated string) of servers; requests are spread across them
+        self.balancer = HostPool(host or default_host(), strategy=strategy, keep_alive=keep_alive)
+        self.host = self.balancer.primary.host
         self.model = model
+        self.timeout = timeout
+        # keep_alive keeps the model resident between calls; a fixed system prefix lets Ollama reuse its prompt cache
+        self.keep_alive = keep_alive
+        self.system = system
+        self.options = dict(options or {})
+        if num_ctx is not None:
+            self.options["num_ctx"] = num_ctx
+        if num_predict is not None:
+            self.options["num_predict"] = num_predict
+        # Short answers (yes/no, numbered suggestions) don't need the model's full generation length
+        self.num_predict_limits = {**NUM_PREDICT, **(num_predict_limits or {})}
+        # Tags, pulls and preloads use this requests session; chat and aembed go through aiohttp
+        self.session = session or create_session(pool_size=pool_size, retries=retries)
+        self.retries = retries
+        # Requests in flight at once per event loop; every sync call shares background_loop()'s limit
+        self.max_concurrency = max_concurrency or pool_size
+        self._aio_sessions = weakref.WeakKeyDictionary()  # event loop -> (aiohttp session, semaphore)
+        self._embedders = {}
+        # cache=True uses the default on-disk cache, a ResponseCache instance is used as-is, False disables it
+        self.cache = ResponseCache() if cache is True else (cache or None)
+        self.last_stats = {}
+        # Per-call events; by default the process-wide collector (LLM_METRICS_LOG / LLM_METRICS_PORT)
+        self.metrics = metrics if isinstance(metrics, Metrics) else default_metrics()
+        # sandbox=True runs candidate code in a warm forked worker pool where fork is available
+        if sandbox is True:
+            sandbox = SandboxPool() if SandboxPool.supported() else None
+        self.sandbox = sandbox or None
+        # Reject code that cannot run (syntax, missing modules, blocking input) without launching it
+        self.static_check = static_check
+        self._library = None
+        self._library_lock = threading.Lock()
+        # Model selection and pulls go through the first host
+        self.model_manager = self.balancer.primary.manager
         if self.model is None:
             self.choose_model()
+        if preload and self.model:
+            # Load the model while the caller does other startup work (e.g. waits for user input)
+            self.balancer.preload(self.model)
+
+    def close(self):
+        self.balancer.close()
+        self.session.close()
+        state = self._aio_sessions.pop(background_loop(), None)
+        if state is not None:
+            asyncio.run_coroutine_threadsafe(state[0].close(), background_loop()).result()
+        for embedder in self._embedders.values():
+            embedder.close()
+        if self.sandbox is not None:
+            self.sandbox.close()
 
     def choose_model(self):
         tags_data = self.wait_for_tags()
@@ -38,25 +276,222 @@ class LLM:
             print("❌ Invalid selection. Try again.")
 
 
-    def _chat(self, prompt: str) -> str:
-        try:
-            response = requests.post(
-                f"http://{self.host}/api/chat",
-                json={"model": self.model, "messages": [{"role": "user", "content": prompt}]},
-                stream=True
+    def _messages_for(self, prompt: str) -> list[dict]:
+        messages = [{"role": "system", "content": self.system}] if self.system else []
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    # The async methods below are the request path; the sync ones drive them on background_loop()
+
+    def _aio(self):
+        """aiohttp session and concurrency semaphore of the running event loop."""
+        loop = asyncio.get_running_loop()
+        state = self._aio_sessions.get(loop)
+        if state is None or state[0].closed:
+            connect_timeout, read_timeout = self.timeout
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
             )
+            state = self._aio_sessions[loop] = (session, asyncio.Semaphore(self.max_concurrency))
+        return state
+
+    async def _aopen(self, session, path: str, payload: dict, model=None):
+        """POST through the host pool; returns (backend, response) and the caller releases the backend.
+
+        Like the requests session: connection failures move to another host, and once every host
+        failed (or on 502-504) the request is retried up to `retries` times with backoff.
+        """
+        tried = set()
+        attempt = 0
+        while True:
+            backend = self.balancer.acquire(model, exclude=tried)
+            try:
+                response = await session.post(backend.url(path), json=payload)
+            except AIO_FAILOVER_ERRORS:
+                # Nothing has been sent back yet, so the request can move to another host
+                self.balancer.release(backend, failed=True)
+                tried.add(backend.host)
+                if len(tried) < len(self.balancer.backends):
+                    continue
+                if attempt >= self.retries:
+                    raise
+            except BaseException:
+                self.balancer.release(backend)
+                raise
+            else:
+                if response.status not in RETRY_STATUSES or attempt >= self.retries:
+                    return backend, response
+                response.release()
+                self.balancer.release(backend)
+            attempt += 1
+            tried.clear()
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    async def _apost(self, path: str, payload: dict, model=None):
+        """Non-streaming POST; returns (status, parsed JSON body, or the text if it isn't JSON)."""
+        session, semaphore = self._aio()
+        async with semaphore:
+            backend, response = await self._aopen(session, path, payload, model)
+            try:
+                async with response:
+                    text = await response.text()
+            finally:
+                self.balancer.release(backend)
+        try:
+            return response.status, json.loads(text)
+        except ValueError:
+            return response.status, text
+
+    async def astream_messages(self, messages: list[dict], options=None, use_cache=True):
+        """Async generator of response tokens for a conversation as Ollama streams them.
+
+        Responses are cached, every call is recorded in self.metrics and requests are spread over
+        the host pool. When the stream ends, self.last_stats holds time-to-first-token, total
+        latency and the token counts/rates from Ollama's final frame.
+        """
+        options = {**self.options, **(options or {})}
+        payload = {"model": self.model, "messages": messages}
+        if options:
+            payload["options"] = options
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        start = time.perf_counter()
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = make_key("chat", self.model, messages, options)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                elapsed = time.perf_counter() - start
+                self.last_stats = {"cached": True, "ttft": elapsed, "total": elapsed}
+                self.metrics.record("llm", model=self.model, cached=True, ttft_s=elapsed, total_s=elapsed)
+                yield cached
+                return
+
+        session, semaphore = self._aio()
+        parts = []
+        ttft = None
+        final = {}
+        error = None
+        backend = None
+        async with semaphore:
+            try:
+                backend, response = await self._aopen(session, "/api/chat", payload, self.model)
+                async with response:
+                    if response.status != 200:
+                        error = f"HTTP {response.status}"
+                        print(f"❌ Error {response.status}: {await response.text()}")
+                        return
+
+                    buffer = b""
+                    async for chunk in response.content.iter_any():
+                        buffer += chunk
+                        *lines, buffer = buffer.split(b"\n")
+                        for line in lines:
+                            if not line.strip():
+                                continue
+                            data = json.loads(line.decode("utf-8"))
+                            content = data.get("message", {}).get("content", "")
+                            if content:
+                                if ttft is None:
+                                    ttft = time.perf_counter() - start
+                                parts.append(content)
+                                yield content
+                            if data.get("done"):
+                                final = data
+            except (aiohttp.ClientError, asyncio.TimeoutError, requests.exceptions.RequestException) as e:
+                error = type(e).__name__
+                raise
+            finally:
+                if backend is not None:
+                    self.balancer.release(backend)
+                self.last_stats = stats_from_final_frame(final, ttft, time.perf_counter() - start)
+                stats = self.last_stats
+                self.metrics.record(
+                    "llm", model=self.model, cached=False, error=error or (None if final else "incomplete"),
+                    prompt_tokens=stats["prompt_tokens"], response_tokens=stats["response_tokens"],
+                    load_s=stats["load_duration"], ttft_s=stats["ttft"], total_s=stats["total"],
+                    tokens_per_sec=stats["tokens_per_sec"], host=backend.host if backend else None,
+                )
+
+        full_response = "".join(parts).strip()
+        # A stream cut off before its final frame is not a complete answer; don't replay it later
+        if full_response and final.get("done") and cache_key is not None:
+            self.cache.set(cache_key, full_response)
+
+    async def achat_messages(self, messages: list[dict], options=None, use_cache=True, on_token=None) -> str:
+        parts = []
+        async for token in self.astream_messages(messages, options=options, use_cache=use_cache):
+            parts.append(token)
+            if on_token:
+                on_token(token)
+        return "".join(parts).strip()
+
+    async def achat(self, prompt: str, options=None, use_cache=True, on_token=None, kind=None) -> str:
+        """Chat without blocking the event loop; `kind` (e.g. "verify") applies that prompt type's num_predict cap."""
+        if kind is not None:
+            options = self._limited(kind, options)
+        return await self.achat_messages(self._messages_for(prompt), options=options, use_cache=use_cache,
+                                         on_token=on_token)
+
+    async def aembed(self, texts: list[str], model=DEFAULT_EMBED_MODEL) -> list[list[float]]:
+        """Embed texts through the host pool, sharing the embedder's batching and on-disk cache."""
+        return await self.embedder(model).aembed(texts, lambda path, payload: self._apost(path, payload, model))
+
+    async def aclose(self):
+        """Close the aiohttp session of the running event loop; close() handles the sync side."""
+        state = self._aio_sessions.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].close()
+
+    def _iterate(self, agen):
+        """Run an async generator on the background loop and yield its items in this thread."""
+        items = queue.Queue()
+        finished = object()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((item, None))
+                items.put((finished, None))
+            except Exception as e:
+                items.put((finished, e))
+            finally:
+                await agen.aclose()
+
+        future = asyncio.run_coroutine_threadsafe(pump(), background_loop())
+        try:
+            while True:
+                item, error = items.get()
+                if item is finished:
+                    if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+                        raise _as_requests_error(error) from error
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            # The caller stopped early (or failed); don't leave the request streaming
+            future.cancel()
+
+    def stream_messages(self, messages: list[dict], options=None, use_cache=True):
+        """Yield response tokens for a conversation as Ollama streams them (see astream_messages)."""
+        return self._iterate(self.astream_messages(messages, options=options, use_cache=use_cache))
+
+    def stream_chat(self, prompt: str, options=None, use_cache=True):
+        """Yield response tokens for a single prompt as Ollama streams them."""
+        return self.stream_messages(self._messages_for(prompt), options=options, use_cache=use_cache)
+
+    def _chat_messages(self, messages: list[dict], options=None, use_cache=True, on_token=None) -> str:
+        try:
+            parts = []
+            for token in self.stream_messages(messages, options=options, use_cache=use_cache):
+                parts.append(token)
+                if on_token:
+                    on_token(token)
+            full_response = "".join(parts)
 
-            if response.status_code != 200:
-                print(f"❌ Error {response.status_code}: {response.text}")
-                return ""
-
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    data = json.loads(line.decode("utf-8"))
-                    content = data.get("message", {}).get("content", "")
-                    full_response += content
-            
             if not full_response:
                 print("⚠️ Warning: Ollama returned an empty response.")
 
@@ -66,55 +501,97 @@ class LLM:
             print("❌ Failed to contact Ollama:", e)
             return ""
 
+    def _chat(self, prompt: str, options=None, use_cache=True, on_token=None) -> str:
+        return self._chat_messages(self._messages_for(prompt), options=options, use_cache=use_cache, on_token=on_token)
 
-    def clean_code(self, response: str) -> str:
-        code_blocks = re.findall(r"```(?:python)?\n(.*?)```", response, re.DOTALL)
-        return code_blocks[0].strip() if code_blocks else response.strip()
-
-    def generate_code(self, purpose: str) -> str:
-        prompt = f"""Write a complete Python script that fulfills the following purpose:\n\n"{purpose}"\n\nReturn only the full code."""
-        return self.clean_code(self._chat(prompt))
-
-    def get_suggestions(self, code: str) -> list[str]:
-        prompt = f"""You are an experienced Python developer. Given the following code:\n\n--- CODE ---\n{code}\n\nSuggest 3 improvements or refactorings. Keep them short and numbered."""
-        response = self._chat(prompt)
-        suggestions = [line.strip() for line in response.splitlines() if line.strip().startswith(("1.", "2.", "3."))]
-        return suggestions
+    def _limited(self, kind: str, options=None):
+        """options with the num_predict cap for this prompt type, unless a lower one is already set."""
+        limit = self.num_predict_limits.get(kind)
+        options = dict(options or {})
+        current = options.get("num_predict", self.options.get("num_predict"))
+        if limit is not None and (current is None or current < 0 or current > limit):
+            options["num_predict"] = limit
+        return options or None
 
-    def apply_suggestion(self, code: str, suggestion: str) -> str:
-        prompt = f"""You're a Python coding assistant. Update the code below according to the instruction.\n\n--- INSTRUCTION ---\n{suggestion}\n\n--- ORIGINAL CODE ---\n{code}\n\nRespond with the updated code only."""
-        return self.clean_code(self._chat(prompt))
-
-    def fix_code_error(self, code: str, error: str) -> str:
-        prompt = f"""The following Python script causes an error when executed.\n\n--- Code ---\n{code}\n\n--- Error ---\n{error}\n\nFix the error so that the script runs correctly and fulfills the original intent. Return the full updated code only."""
-        return self.clean_code(self._chat(prompt))
+    def chat_session(self, system=None, options=None, max_messages=None) -> "ChatSession":
+        return ChatSession(self, system=system, options=options, max_messages=max_messages)
 
+    def clean_code(self, response: str) -> str:
+        return extract_code(response)
+
+    @operation("generate_code")
+    def generate_code(self, purpose: str, options=None, on_token=None) -> str:
+        return self.clean_code(self._chat(GENERATE_PROMPT.format(purpose=purpose), options=options, on_token=on_token))
+
+    @operation("get_suggestions")
+    def get_suggestions(self, code: str, on_token=None) -> list[str]:
+        return parse_suggestions(self._chat(SUGGESTIONS_PROMPT.format(code=code), options=self._limited("suggestions"),
+                                                on_token=on_token))
+
+    @operation("apply_suggestion")
+    def apply_suggestion(self, code: str, suggestion: str, on_token=None) -> str:
+        return self.clean_code(self._chat(APPLY_PROMPT.format(suggestion=suggestion, code=code), on_token=on_token))
+
+    @operation("apply_suggestion_diff")
+    def apply_suggestion_diff(self, code: str, suggestion: str, on_token=None, max_lines=200) -> str:
+        """Like apply_suggestion, but the model returns only a diff of the relevant functions.
+
+        Large files are cut down to the definitions the instruction mentions before prompting.
+        Falls back to a full-file rewrite if the diff cannot be applied.
+        """
+        excerpt = relevant_chunks(code, suggestion, max_lines=max_lines) or code
+        response = self._chat(DIFF_PROMPT.format(suggestion=suggestion, code=excerpt), on_token=on_token)
+        try:
+            return apply_unified_diff(code, response)
+        except PatchError as e:
+            print(f"\n⚠️ Could not apply the diff ({e}); asking for the full file instead.")
+            return self.apply_suggestion(code, suggestion, on_token=on_token)
+
+    @operation("fix_code_error")
+    def fix_code_error(self, code: str, error: str, on_token=None, session=None) -> str:
+        if session is None:
+            return self.clean_code(self._chat(FIX_PROMPT.format(code=code, error=error), on_token=on_token))
+        # Later attempts in the same session only send the new error; the code is already in the history
+        prompt = FIX_FOLLOWUP_PROMPT.format(error=error) if session.turns else FIX_PROMPT.format(code=code, error=error)
+        return self.clean_code(session.send(prompt, on_token=on_token))
+
+    @operation("explain_exception")
     def explain_exception(self, exc: Exception):
         error_details = traceback.format_exc()
-        prompt = f"I got this Python exception:\n\n{error_details}\n\nCan you explain what it means, and suggest some possible fixes?"
+        prompt = EXPLAIN_PROMPT.format(error_details=error_details)
         try:
-            response = requests.post(
-                f"http://{self.host}/api/chat",
-                json={"model": self.model, "messages": [{"role": "user", "content": prompt}]},
-                stream=True
-            )
             print("\n🤖 Ollama says:\n")
-            for line in response.iter_lines():
-                if line:
-                    data = json.loads(line.decode("utf-8"))
-                    print(data.get("message", {}).get("content", ""), end="", flush=True)
+            for token in self.stream_chat(prompt, options=self._limited("explain")):
+                print_token(token)
             print()
         except Exception as e:
             print("Error contacting Ollama:", e)
 
+    @operation("try_run_code")
     def try_run_code(self, code: str) -> tuple[bool, str, str]:
+        start = time.perf_counter()
+        if self.static_check:
+            problem = precheck(code, timeout=self.sandbox.timeout if self.sandbox is not None else 10)
+            self.metrics.record("precheck", error=problem.splitlines()[-1] if problem else None,
+                                total_s=time.perf_counter() - start)
+            if problem:
+                return False, problem, ""
+        if self.sandbox is not None:
+            result = self.sandbox.run(code)
+            self.metrics.record("sandbox", sandboxed=True, returncode=result["returncode"],
+                                timed_out=result["timed_out"], total_s=time.perf_counter() - start)
+            return result["returncode"] == 0, result["stderr"].strip(), result["stdout"].strip()
         with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
             f.write(code)
             path = f.name
         try:
             result = subprocess.run(["python3", path], capture_output=True, text=True, timeout=10)
+            self.metrics.record("sandbox", sandboxed=False, returncode=result.returncode, timed_out=False,
+                                total_s=time.perf_counter() - start)
             return result.returncode == 0, result.stderr.strip(), result.stdout.strip()
         except Exception as e:
+            self.metrics.record("sandbox", sandboxed=False, returncode=None, timed_out=isinstance(e, subprocess.TimeoutExpired),
+                                error=type(e).__name__, total_s=time.perf_counter() - start)
             return False, str(e), ""
         finally:
             os.remove(path)
@@ -132,120 +609,390 @@ class LLM:
         finally:
             os.remove(temp_filename)
 
-    def evolve_script(self, purpose: str, max_iterations=10, max_fixes=3, save=True):
-        print(f"🎯 Purpose: {purpose}")
-        code = self.generate_code(purpose)
-        print("\n🧠 Initial Code:\n" + "-" * 40 + f"\n{code}\n" + "-" * 40)
-
+    def evolve_script(self, purpose: str, max_iterations=10, max_fixes=3, save=True,
+                      beam_width=1, population=4, workers=None, patience=3, on_token=None, ask_to_run=True,
+                      verbose=True, reuse=True, reuse_threshold=0.97, seed_threshold=0.85, token_budget=None,
+                      time_budget=None, cancel=None) -> dict:
+        """Generate, run, fix and refine a script until it fulfills `purpose`.
+
+        With `reuse`, a previously verified script for the same purpose is returned as-is if it
+        still runs; one for a very similar purpose (similarity >= reuse_threshold) is returned only
+        if its output also passes verification for this purpose. Otherwise a match above
+        seed_threshold replaces the initial generate_code call.
+
+        token_budget (prompt + response tokens) and time_budget (seconds) end the run early with
+        the best version so far, as does setting the `cancel` threading.Event. The run also stops
+        once every suggested edit only reproduces a version it has already tried.
+
+        Returns a summary dict with the final code (None if it could never be made to run),
+        whether the output was verified, why it stopped, the iteration count, the saved path
+        (or reused script), elapsed time and per-method call metrics.
+        """
+        log = print if verbose else _quiet
+        start = time.perf_counter()
+        with self.metrics.scope() as run_metrics:
+            budget = Budget(run_metrics, max_tokens=token_budget, max_seconds=time_budget, cancel=cancel)
+            log(f"🎯 Purpose: {purpose}")
+            if self.sandbox is not None:
+                self.sandbox.prewarm()
+            match = self._find_reusable(purpose, log) if reuse else None
+            seed = None
+            result = None
+            if match is not None and match[0] >= reuse_threshold:
+                score, path, code = match
+                success, _, output = self.try_run_code(code)
+                # A near match was verified for a different purpose, so check its output against this one
+                if success and (score >= 1.0 or self.verify_output_fulfills_purpose(purpose, output)):
+                    log(f"♻️ Reusing verified script {path} (similarity {score:.2f})")
+                    result = {"code": code, "iterations": 0, "verified": True, "stopped": "reused", "reused": path}
+                else:
+                    log(f"🌱 Starting from {path} (similarity {score:.2f})")
+                    seed = code
+            elif match is not None and match[0] >= seed_threshold:
+                log(f"🌱 Starting from {match[1]} (similarity {match[0]:.2f})")
+                seed = match[2]
+
+            if result is None and beam_width > 1:
+                # on_token is only used on the serial path; concurrent candidates would interleave their tokens
+                result = self._evolve_beam(purpose, max_iterations, max_fixes, beam_width, population, workers, patience,
+                                           log, seed=seed, budget=budget)
+            elif result is None:
+                result = self._evolve_serial(purpose, max_iterations, max_fixes, on_token, log, seed=seed, budget=budget)
+            result.update(purpose=purpose, success=result["code"] is not None, path=result.get("reused"))
+
+            code, iteration = result["code"], result["iterations"]
+            if code is not None:
+                log(f"\n✅ Final Code after {iteration} iteration{'s' if iteration != 1 else ''}:")
+                log("-" * 40 + f"\n{code}\n" + "-" * 40)
+
+                if save and not result.get("reused") and result["stopped"] != "cancelled":
+                    result["path"] = self.save_code(code, purpose, verbose=verbose, verified=result["verified"])
+
+                if ask_to_run and input("\n🚀 Do you want to run the final version? (y/n): ").lower() == "y":
+                    _, _, final_output = self.try_run_code(code)
+                    log(f"\n📤 Final Output:\n{final_output}")
+
+        result["elapsed_s"] = time.perf_counter() - start
+        result["metrics"] = run_metrics.snapshot()
+        log("\n" + format_summary(result["metrics"]))
+        return result
+
+    def _find_reusable(self, purpose: str, log=print):
+        """Closest verified script from earlier runs as (similarity, path, code), or None."""
+        try:
+            return self.script_library().lookup(purpose)
+        except (requests.exceptions.RequestException, OSError, ValueError, KeyError) as e:
+            log(f"⚠️ Script library lookup failed, generating from scratch: {e}")
+            return None
+
+    def embedder(self, model=DEFAULT_EMBED_MODEL):
+        """OllamaEmbedder for `model` that shares this LLM's session and host pool."""
+        with self._library_lock:
+            if model not in self._embedders:
+                from embeddings import OllamaEmbedder
+                self._embedders[model] = OllamaEmbedder(model_name=model, session=self.session, timeout=self.timeout,
+                                                        balancer=self.balancer)
+            return self._embedders[model]
+
+    def script_library(self, directory="evolved_scripts"):
+        embedder = self.embedder()
+        with self._library_lock:
+            if self._library is None:
+                from script_library import ScriptLibrary
+                self._library = ScriptLibrary(directory, embedder=embedder)
+            return self._library
+
+    def _evolve_serial(self, purpose: str, max_iterations: int, max_fixes: int, on_token=None, log=print,
+                       seed=None, budget=None) -> dict:
+        budget = budget or Budget(None)
+        code = seed or self.generate_code(purpose, on_token=on_token)
+        log("\n🧠 Initial Code:\n" + "-" * 40 + f"\n{code}\n" + "-" * 40)
+
+        seen = {code_hash(code)}
+        last_good = None
         iteration = 0
+        verified = False
+        stopped = "max_iterations"
         while iteration < max_iterations:
-            print(f"\n🔁 Iteration {iteration + 1}")
+            log(f"\n🔁 Iteration {iteration + 1}")
             success, error, output = self.try_run_code(code)
             if not success:
-                print("❌ Script failed. Attempting to fix...")
+                log("❌ Script failed. Attempting to fix...")
+                fixer = self.chat_session()
+                tried = {code_hash(code)}
                 for fix_attempt in range(max_fixes):
-                    code = self.fix_code_error(code, error)
+                    if budget.exceeded():
+                        break
+                    code = self.fix_code_error(code, error, on_token=on_token, session=fixer)
+                    digest = code_hash(code)
+                    if digest in tried:
+                        log("🔂 The fix gave back a version that already failed.")
+                        break
+                    tried.add(digest)
+                    seen.add(digest)
                     success, error, output = self.try_run_code(code)
                     if success:
-                        print(f"✅ Fixed and ran on attempt {fix_attempt + 1}")
+                        log(f"✅ Fixed and ran on attempt {fix_attempt + 1}")
                         break
-                else:
-                    print("💥 Could not fix the script after multiple attempts.")
-                    return
+                if not success:
+                    stopped = budget.exceeded() or "unfixable"
+                    log(_stop_message(stopped))
+                    # The last version that ran, if any, is still a usable result
+                    return {"code": last_good, "iterations": iteration, "verified": False, "stopped": stopped}
+            last_good = code
             if self.verify_output_fulfills_purpose(purpose, output):
-                print("🎉 Success! The script fulfills its purpose.")
+                log("🎉 Success! The script fulfills its purpose.")
+                verified = True
+                stopped = "verified"
+                break
+            reason = budget.exceeded()
+            if reason:
+                stopped = reason
+                log(_stop_message(stopped))
                 break
             suggestions = self.get_suggestions(code)
             if not suggestions:
-                print("🤷 No more suggestions. Stopping.")
+                log("🤷 No more suggestions. Stopping.")
+                stopped = "no_suggestions"
+                break
+            # A suggestion that leaves the code as it is (or as it was earlier) would just repeat an iteration
+            for suggestion in suggestions:
+                log(f"💡 Applying suggestion: {suggestion}")
+                candidate = self.apply_suggestion(code, suggestion, on_token=on_token)
+                digest = code_hash(candidate)
+                if digest not in seen:
+                    break
+                log("🔂 That edit gives a version already tried.")
+            else:
+                stopped = "converged"
+                log(_stop_message(stopped))
                 break
-            print(f"💡 Applying suggestion: {suggestions[0]}")
-            code = self.apply_suggestion(code, suggestions[0])
+            seen.add(digest)
+            code = candidate
             iteration += 1
-
-        print(f"\n✅ Final Code after {iteration} iteration{'s' if iteration != 1 else ''}:")
-        print("-" * 40 + f"\n{code}\n" + "-" * 40)
-
-        if save:
-            self.save_code(code, purpose)
-
-        run_final = input("\n🚀 Do you want to run the final version? (y/n): ")
-        if run_final.lower() == "y":
-            _, _, final_output = self.try_run_code(code)
-            print(f"\n📤 Final Output:\n{final_output}")
-
+        # On max_iterations the last candidate was never run; the last version that ran is the result
+        return {"code": last_good, "iterations": iteration, "verified": verified, "stopped": stopped}
+
+    def _evaluate_candidate(self, purpose: str, code: str, max_fixes: int, budget=None) -> dict:
+        """Run a candidate, try to fix it, and score it: verified > runs > fails, fewer fixes first."""
+        budget = budget or Budget(None)
+        success, error, output = self.try_run_code(code)
+        fixes = 0
+        fixer = self.chat_session()
+        tried = {code_hash(code)}
+        while not success and fixes < max_fixes and not budget.exceeded():
+            fixed = self.fix_code_error(code, error, session=fixer)
+            fixes += 1
+            digest = code_hash(fixed)
+            if digest in tried:
+                break
+            tried.add(digest)
+            code = fixed
+            success, error, output = self.try_run_code(code)
+        verified = success and self.verify_output_fulfills_purpose(purpose, output)
+        return {"code": code, "success": success, "verified": verified, "output": output,
+                "score": (verified, success, -fixes)}
+
+    def _evolve_beam(self, purpose: str, max_iterations: int, max_fixes: int, beam_width: int,
+                     population: int, workers=None, patience=3, log=print, seed=None, budget=None) -> dict:
+        """Beam search over candidates: each iteration expands every survivor with all of its
+        suggestions, evaluates the whole population concurrently and keeps the best `beam_width`.
+        Edits that reproduce a version already seen in this run are not evaluated again."""
+        budget = budget or Budget(None)
+        population = max(population, beam_width)
+        seen = set()
+        seen_lock = threading.Lock()
+
+        def is_new(code):
+            digest = code_hash(code)
+            with seen_lock:
+                if digest in seen:
+                    return False
+                seen.add(digest)
+                return True
+
+        def expand(edit):
+            child = self.apply_suggestion(*edit)
+            return self._evaluate_candidate(purpose, child, max_fixes, budget) if is_new(child) else None
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+            # Distinct seeds keep the initial population from collapsing onto one sample
+            seeds = [seed] if seed else []
+            seeds += pool.map(in_context(lambda i: self.generate_code(purpose, options={"seed": i})),
+                              range(population - len(seeds)))
+            seeds = [code for code in seeds if is_new(code)]
+            candidates = list(pool.map(in_context(lambda c: self._evaluate_candidate(purpose, c, max_fixes, budget)),
+                                       seeds))
+            for candidate in candidates:
+                is_new(candidate["code"])
+            beam = sorted(candidates, key=lambda c: c["score"], reverse=True)[:beam_width]
+            log(f"\n🧠 Initial population: {len(seeds)}, best score {beam[0]['score']}")
+
+            iteration = 0
+            stale = 0
+            stopped = "max_iterations"
+            while iteration < max_iterations and not beam[0]["verified"]:
+                reason = budget.exceeded()
+                if reason:
+                    stopped = reason
+                    log(_stop_message(stopped))
+                    break
+                log(f"\n🔁 Iteration {iteration + 1}")
+                parents = [c for c in beam if c["success"]]
+                if not parents:
+                    log("💥 Could not fix any candidate after multiple attempts.")
+                    return {"code": None, "iterations": iteration, "verified": False, "stopped": "unfixable"}
+
+                suggestion_lists = list(pool.map(in_context(lambda c: self.get_suggestions(c["code"])), parents))
+                edits = [(p["code"], s) for p, suggestions in zip(parents, suggestion_lists) for s in suggestions]
+                if not edits:
+                    log("🤷 No more suggestions. Stopping.")
+                    stopped = "no_suggestions"
+                    break
+                edits = edits[:population]
+                log(f"💡 Evaluating {len(edits)} candidates from {len(parents)} parents")
+
+                children = [c for c in pool.map(in_context(expand), edits) if c is not None]
+                iteration += 1
+                if not children:
+                    stopped = "converged"
+                    log(_stop_message(stopped))
+                    break
+                for child in children:
+                    is_new(child["code"])
+                best_before = beam[0]["score"]
+                beam = sorted(beam + children, key=lambda c: c["score"], reverse=True)[:beam_width]
+
+                stale = stale + 1 if beam[0]["score"] <= best_before else 0
+                if patience and stale >= patience:
+                    log(f"⏹️ No improvement in {stale} iterations. Stopping early.")
+                    stopped = "stalled"
+                    break
+
+        if beam[0]["verified"]:
+            log("🎉 Success! The script fulfills its purpose.")
+            stopped = "verified"
+        elif not beam[0]["success"]:
+            log("💥 Could not fix the script after multiple attempts.")
+            return {"code": None, "iterations": iteration, "verified": False, "stopped": "unfixable"}
+        return {"code": beam[0]["code"], "iterations": iteration, "verified": beam[0]["verified"], "stopped": stopped}
+
+    @operation("verify_output_fulfills_purpose")
     def verify_output_fulfills_purpose(self, purpose: str, output: str) -> bool:
-        prompt = f"""The original goal is: \"{purpose}\"\n\nThe script produced this output:\n\n--- Output ---\n{output}\n\nDoes this output fulfill the goal? Answer with only \"yes\" or \"no\"."""
-        response = self._chat(prompt).strip().lower()
-        return response.startswith("yes")
-
-    def save_code(self, code: str, purpose: str, directory="evolved_scripts"):
+        prompt = VERIFY_PROMPT.format(purpose=purpose, output=output)
+        answer = self._chat(prompt, options=self._limited("verify"))
+        if not is_yes(answer) and not is_no(answer):
+            # Reasoning models use up the capped tokens thinking; ask again without the cap
+            answer = self._chat(prompt)
+        return is_yes(answer)
+
+    def save_code(self, code: str, purpose: str, directory="evolved_scripts", verbose=True, verified=False) -> str:
         os.makedirs(directory, exist_ok=True)
-        filename = f"{directory}/{datetime.now().strftime('%Y%m%d_%H%M%S')}.py"
-        with open(filename, "w") as f:
-            f.write("# Purpose: " + purpose + "\n\n" + code)
-        print(f"💾 Final script saved to: {filename}")
+        stem = f"{directory}/{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        filename = f"{stem}.py"
+        suffix = 1
+        while True:
+            try:
+                # Exclusive create so concurrent batch runs finishing in the same second don't overwrite each other
+                with open(filename, "x") as f:
+                    f.write("# Purpose: " + purpose + "\n# Verified: " + ("yes" if verified else "no") + "\n\n" + code)
+                break
+            except FileExistsError:
+                filename = f"{stem}_{suffix}.py"
+                suffix += 1
+        if verbose:
+            print(f"💾 Final script saved to: {filename}")
+        return filename
 
     def wait_for_ready(self, max_attempts=30):
         print("⏳ Waiting for Ollama to be ready...")
-        for _ in range(max_attempts):
-            try:
-                res = requests.get(f"http://{self.host}/api/tags")
-                if res.status_code == 200:
-                    print("✅ Ollama is ready.")
-                    return True
-            except Exception:
-                pass
-            time.sleep(1)
-        raise RuntimeError("❌ Ollama did not start in time.")
+        try:
+            self.model_manager.wait_until_ready(timeout=max_attempts)
+        except RuntimeError:
+            raise RuntimeError("❌ Ollama did not start in time.")
+        print("✅ Ollama is ready.")
+        return True
 
     def model_exists(self, model_name: str) -> bool:
-        tags = self.wait_for_tags()
-        models = [m["name"] for m in tags.get("models", [])]
-        print("Available models:", models)
-        return any(model_name in m for m in models)
+        print("Available models:", self.model_manager.model_names())
+        return self.model_manager.has_model(model_name)
 
     def wait_for_tags(self, max_attempts=10):
-        for attempt in range(max_attempts):
-            try:
-                res = requests.get(f"http://{self.host}/api/tags")
-                if res.status_code == 200:
-                    return res.json()
-            except:
-                pass
-            print(f"⏳ Waiting for Ollama model registry... ({attempt + 1}/{max_attempts})")
-            time.sleep(1)
-        raise RuntimeError("❌ Timed out waiting for /api/tags")
+        def progress(attempt):
+            if attempt % 10 == 0:
+                print(f"⏳ Waiting for Ollama model registry... ({attempt} attempts)")
+        return self.model_manager.tags(timeout=max_attempts, progress=progress)
 
     def pull_model(self, model_name: str):
-        if self.model_exists(model_name):
-            print(f"✅ Model '{model_name}' already present.")
-            return
-        print(f"⬇️ Pulling model '{model_name}' from Ollama...")
-        response = requests.post(f"http://{self.host}/api/pull", json={"name": model_name}, stream=True)
-        for line in response.iter_lines():
-            if line:
-                print(line.decode("utf-8"))
+        self.pull_models([model_name])
+
+    def pull_models(self, model_names: list[str], max_concurrency=2, retries=3) -> list[dict]:
+        names = [name for name in model_names if name]
+        present = [name for name in names if self.model_manager.has_model(name)]
+        for name in present:
+            print(f"✅ Model '{name}' already present.")
+        missing = [name for name in names if name not in present]
+        if not missing:
+            return []
+
+        print(f"⬇️ Pulling {', '.join(repr(name) for name in missing)} from Ollama...")
+        puller = ModelPuller(self.model_manager, session=self.session, max_concurrency=max_concurrency, retries=retries)
+        results = puller.pull_many(missing)
+        for result in results:
+            if result["status"] == "failed":
+                print(f"❌ Failed to pull '{result['model']}' after {result['attempts']} attempts: {result['error']}")
+            else:
+                print(f"✅ Pulled '{result['model']}' in {result['seconds']:.1f}s "
+                      f"({result['downloaded_bytes'] / 1e6:,.0f} MB new, {result['skipped_layers']} layers already present)")
         print("✅ Model pull complete.")
+        return results
 
-        
     def list_available_models(self):
         print("📦 Fetching list of available models from Ollama...")
         try:
-            response = requests.get(f"http://{self.host}/api/tags")
-            if response.status_code != 200:
-                print(f"❌ Error fetching models: {response.status_code} - {response.text}")
-                return
+            tags_data = self.model_manager.tags(timeout=PROBE_TIMEOUT[1])
+        except RuntimeError as e:
+            print(f"❌ Failed to connect to Ollama: {e}")
+            return
 
-            tags_data = response.json()
-            models = tags_data.get("models", [])
-            if not models:
-                print("⚠️ No models found.")
-                return
+        models = tags_data.get("models", [])
+        if not models:
+            print("⚠️ No models found.")
+            return
 
-            print("✅ Available models:")
-            for model in models:
-                print(f" - {model.get('name')}")
+        print("✅ Available models:")
+        for model in models:
+            print(f" - {model.get('name')}")
 
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Failed to connect to Ollama: {e}")
+
+class ChatSession:
+    """A multi-turn conversation with one model.
+
+    History is resent on every turn with the same system prefix and keep_alive, so Ollama can
+    reuse the already-evaluated prompt instead of starting cold. `max_messages` bounds the
+    history by dropping the oldest turns (the system message is always kept).
+    """
+
+    def __init__(self, llm: LLM, system=None, options=None, max_messages=None):
+        self.llm = llm
+        self.system = system if system is not None else llm.system
+        self.options = options
+        self.max_messages = max_messages
+        self.messages = []
+
+    @property
+    def turns(self) -> int:
+        return sum(1 for m in self.messages if m["role"] == "user")
+
+    def _request_messages(self) -> list[dict]:
+        history = self.messages[-self.max_messages:] if self.max_messages else self.messages
+        return ([{"role": "system", "content": self.system}] if self.system else []) + history
+
+    def send(self, prompt: str, on_token=None, use_cache=True) -> str:
+        self.messages.append({"role": "user", "content": prompt})
+        reply = self.llm._chat_messages(self._request_messages(), options=self.options, use_cache=use_cache, on_token=on_token)
+        self.messages.append({"role": "assistant", "content": reply})
+        return reply
+
+    def reset(self):
+        self.messages = []
@@ -1,4 +1,6 @@
-from llm import LLM
+from llm import LLM, format_stats, print_token
 
 llm = LLM()
-print(llm._chat(input("You: ")))
+llm._chat(input("You: "), on_token=print_token)
+print()
+print(format_stats(llm.last_stats))
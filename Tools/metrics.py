@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_operation = contextvars.ContextVar("llm_operation", default=())
+_scopes = contextvars.ContextVar("llm_metric_scopes", default=())
+
+FIELDS = ("calls", "cached", "errors", "prompt_tokens", "response_tokens", "seconds", "ttft_seconds", "load_seconds")
+
+
+def operation(name: str):
+    """Decorator naming the calls made inside a method, e.g. LLM calls from generate_code."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _operation.set(_operation.get() + (name,))
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _operation.reset(token)
+        return wrapper
+    return decorate
+
+
+def current_operation(default="chat") -> str:
+    stack = _operation.get()
+    return stack[-1] if stack else default
+
+
+def in_context(fn):
+    """Wrap `fn` so it runs with the caller's operation and scopes when called from a pool thread."""
+    ctx = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        # Each call gets its own copy; one Context can't be entered by several threads at once
+        return ctx.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+class MetricsSummary:
+    """Per-(kind, method) totals; cheap enough to feed every event into."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def add(self, event: dict):
+        key = (event["kind"], event["method"])
+        with self._lock:
+            totals = self._totals.setdefault(key, dict.fromkeys(FIELDS, 0))
+            totals["calls"] += 1
+            totals["cached"] += bool(event.get("cached"))
+            totals["errors"] += bool(event.get("error"))
+            totals["prompt_tokens"] += event.get("prompt_tokens", 0)
+            totals["response_tokens"] += event.get("response_tokens", 0)
+            totals["seconds"] += event.get("total_s", 0.0)
+            totals["ttft_seconds"] += event.get("ttft_s") or 0.0
+            totals["load_seconds"] += event.get("load_s", 0.0)
+
+    def tokens(self) -> int:
+        """Prompt plus response tokens of every model call so far."""
+        with self._lock:
+            return sum(t["prompt_tokens"] + t["response_tokens"] for (kind, _), t in self._totals.items()
+                       if kind == "llm")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {f"{kind}:{method}": dict(totals) for (kind, method), totals in sorted(self._totals.items())}
+
+
+def format_summary(snapshot: dict) -> str:
+    if not snapshot:
+        return "📊 No LLM calls recorded."
+    lines = ["📊 Where the time went:"]
+    for name, t in sorted(snapshot.items(), key=lambda item: -item[1]["seconds"]):
+        line = f"  {name:<36} {t['calls']:>4} calls {t['seconds']:8.2f}s"
+        if name.startswith("llm:"):
+            line += f"  {t['prompt_tokens']:>7} in / {t['response_tokens']:>6} out tokens, load {t['load_seconds']:.2f}s"
+            if t["cached"]:
+                line += f", {t['cached']} cached"
+        if t["errors"]:
+            line += f", {t['errors']} failed"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class JsonlSink:
+    """Append each event as one JSON line; the structured log for production runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        line = json.dumps(event) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class Metrics:
+    """Collects one event per LLM call / sandbox run and fans it out to the sinks.
+
+    Events are always aggregated into `totals` and into any open `scope()` of the calling
+    context; sinks (e.g. JsonlSink) receive the raw events.
+    """
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self.totals = MetricsSummary()
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        """LLM_METRICS_LOG=path enables the JSONL log, LLM_METRICS_PORT=port the Prometheus endpoint."""
+        metrics = cls()
+        if os.environ.get("LLM_METRICS_LOG"):
+            metrics.sinks.append(JsonlSink(os.environ["LLM_METRICS_LOG"]))
+        if os.environ.get("LLM_METRICS_PORT"):
+            PrometheusExporter(metrics).serve(int(os.environ["LLM_METRICS_PORT"]))
+        return metrics
+
+    def record(self, kind: str, **fields):
+        event = {"ts": time.time(), "kind": kind, "method": current_operation(), **fields}
+        self.totals.add(event)
+        for scope in _scopes.get():
+            scope.add(event)
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                print(f"⚠️ Metrics sink failed: {e}")
+
+    @contextmanager
+    def scope(self):
+        """Totals for just the calls made inside this block (and pool threads using in_context)."""
+        summary = MetricsSummary()
+        token = _scopes.set(_scopes.get() + (summary,))
+        try:
+            yield summary
+        finally:
+            _scopes.reset(token)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_metrics() -> Metrics:
+    """Process-wide Metrics configured from the environment, shared by every LLM instance."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Metrics.from_env()
+        return _default
+
+
+class PrometheusExporter:
+    """Render the running totals in the Prometheus text format, optionally on /metrics."""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self.server = None
+
+    def render(self) -> str:
+        series = {
+            "llm_calls_total": ("counter", "calls"),
+            "llm_cached_calls_total": ("counter", "cached"),
+            "llm_errors_total": ("counter", "errors"),
+            "llm_prompt_tokens_total": ("counter", "prompt_tokens"),
+            "llm_response_tokens_total": ("counter", "response_tokens"),
+            "llm_seconds_total": ("counter", "seconds"),
+            "llm_ttft_seconds_total": ("counter", "ttft_seconds"),
+            "llm_load_seconds_total": ("counter", "load_seconds"),
+        }
+        snapshot = self.metrics.totals.snapshot()
+        lines = []
+        for metric, (metric_type, field) in series.items():
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for name, totals in snapshot.items():
+                kind, method = name.split(":", 1)
+                lines.append(f'{metric}{{kind="{kind}",method="{method}"}} {totals[field]}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not self.path.startswith("/metrics"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics-exporter", daemon=True).start()
+        print(f"📈 Metrics at http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
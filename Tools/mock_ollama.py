@@ -0,0 +1,222 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+MOCK_CODE = """```python
+import datetime
+
+today = datetime.date.today()
+print("Weekday" if today.weekday() < 5 else "Weekend")
+```"""
+MOCK_SUGGESTIONS = "1. Add a main() function.\n2. Add type hints.\n3. Add a docstring."
+
+
+def mock_vector(text: str, dim: int) -> list[float]:
+    """Deterministic pseudo-embedding so repeated texts get identical vectors."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [((digest[i % len(digest)] + i) % 256) / 255.0 for i in range(dim)]
+
+
+def mock_reply(prompt: str, verify_answer: str) -> str:
+    if 'Answer with only "yes" or "no"' in prompt:
+        return verify_answer
+    if "Suggest 3 improvements" in prompt:
+        return MOCK_SUGGESTIONS
+    return MOCK_CODE
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOllama/0.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self) -> "MockOllama":
+        return self.server.mock
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, data: dict, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_frame(self, data: dict):
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        self.mock.record(self.path)
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name, "digest": f"sha256:{name}"} for name in self.mock.models]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        self.mock.record(self.path)
+        body = self._read_json()
+        time.sleep(self.mock.latency)
+        if self.path == "/api/chat":
+            self._chat(body)
+        elif self.path == "/api/embeddings":
+            self._send_json({"embedding": mock_vector(body.get("prompt", ""), self.mock.embed_dim)})
+        elif self.path == "/api/embed" and self.mock.batch_embed:
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            self._send_json({"embeddings": [mock_vector(text, self.mock.embed_dim) for text in texts]})
+        elif self.path == "/api/generate":
+            self._send_json({"model": body.get("model"), "response": "", "done": True, "load_duration": 0})
+        elif self.path == "/api/pull":
+            self._pull(body)
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _chat(self, body: dict):
+        messages = body.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        reply = mock_reply(prompt, self.mock.verify_answer)
+        tokens = reply.split(" ")
+        delay = 1.0 / self.mock.tokens_per_sec if self.mock.tokens_per_sec else 0.0
+        started = time.perf_counter()
+        self._start_stream()
+        for i, token in enumerate(tokens):
+            time.sleep(delay)
+            content = token if i == len(tokens) - 1 else token + " "
+            self._send_frame({"model": body.get("model"), "message": {"role": "assistant", "content": content}, "done": False})
+        elapsed_ns = int((time.perf_counter() - started) * 1e9)
+        self._send_frame({
+            "model": body.get("model"),
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "prompt_eval_count": sum(len(m.get("content", "").split()) for m in messages),
+            "eval_count": len(tokens),
+            "eval_duration": elapsed_ns,
+            "load_duration": int(self.mock.latency * 1e9),
+            "total_duration": elapsed_ns,
+        })
+        self._end_stream()
+
+    def _pull(self, body: dict):
+        name = body.get("name") or body.get("model", "")
+        self._start_stream()
+        self._send_frame({"status": "pulling manifest"})
+        for layer in range(self.mock.pull_layers):
+            digest = "sha256:" + hashlib.sha256(f"{name}/{layer}".encode()).hexdigest()
+            total = self.mock.pull_layer_bytes
+            for completed in range(0, total + 1, max(1, total // 4)):
+                time.sleep(self.mock.latency / 4)
+                self._send_frame({"status": f"pulling {digest[7:19]}", "digest": digest, "total": total, "completed": completed})
+        self._send_frame({"status": "success"})
+        self._end_stream()
+        self.mock.add_model(name)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients dropping keep-alive connections is expected, not worth a traceback
+
+
+class MockOllama:
+    """Local stand-in for the Ollama HTTP API with configurable latency and token rate.
+
+    Serves /api/chat (streamed), /api/tags, /api/embeddings, /api/embed, /api/generate and
+    /api/pull, and counts requests per endpoint so benchmarks can report them.
+    """
+
+    def __init__(self, port=0, latency=0.02, tokens_per_sec=500, embed_dim=768, verify_answer="yes",
+                 batch_embed=True, models=("mock-coder:latest", "nomic-embed-text:latest"),
+                 pull_layers=3, pull_layer_bytes=4 * 1024 * 1024):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.embed_dim = embed_dim
+        self.verify_answer = verify_answer
+        self.batch_embed = batch_embed
+        self.models = list(models)
+        self.pull_layers = pull_layers
+        self.pull_layer_bytes = pull_layer_bytes
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self._server.server_address[1]}"
+
+    def record(self, path: str):
+        with self._lock:
+            self.requests[path] += 1
+
+    def add_model(self, name: str):
+        with self._lock:
+            if name and not any(m == name or m.split(":")[0] == name for m in self.models):
+                self.models.append(name if ":" in name else f"{name}:latest")
+
+    def reset_counts(self) -> Counter:
+        with self._lock:
+            counts, self.requests = self.requests, Counter()
+        return counts
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self) -> "MockOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Ollama server for offline testing.")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every POST")
+    parser.add_argument("--tokens-per-sec", type=float, default=500)
+    args = parser.parse_args()
+
+    mock = MockOllama(port=args.port, latency=args.latency, tokens_per_sec=args.tokens_per_sec)
+    print(f"🧪 Mock Ollama listening on http://{mock.host}")
+    try:
+        mock.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
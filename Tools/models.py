@@ -0,0 +1,235 @@
+import json
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+PROBE_TIMEOUT = (2, 5)
+
+
+def model_matches(wanted: str, name: str) -> bool:
+    """'llama3' matches 'llama3:latest' or any other tag; 'llama3:8b' only matches exactly."""
+    return name == wanted or (":" not in wanted and name.split(":")[0] == wanted)
+
+
+class ModelManager:
+    """Cached view of the Ollama model registry plus readiness polling and model preloading.
+
+    /api/tags answers are reused for `ttl` seconds so choosing, checking and listing models
+    at startup cost one request. Readiness is polled with exponential backoff starting at a
+    few milliseconds instead of a fixed one-second sleep.
+    """
+
+    def __init__(self, host="localhost:11434", keep_alive=None, ttl=5.0, session=None):
+        self.host = host
+        self.keep_alive = keep_alive
+        self.ttl = ttl
+        # Probes must fail fast; the shared LLM session retries with backoff, which would defeat polling
+        self.session = session or requests.Session()
+        if session is None:
+            self.session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=2, max_retries=0))
+        self._tags = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._preloads = {}
+
+    def _url(self, path: str) -> str:
+        return f"http://{self.host}{path}"
+
+    def _fetch_tags(self):
+        try:
+            res = self.session.get(self._url("/api/tags"), timeout=PROBE_TIMEOUT)
+            if res.status_code == 200:
+                return res.json()
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+        return None
+
+    def probe(self):
+        """One /api/tags request; refreshes the cache and returns the tag data, or None if unreachable."""
+        tags = self._fetch_tags()
+        if tags is not None:
+            with self._lock:
+                self._tags, self._fetched_at = tags, time.monotonic()
+        return tags
+
+    def invalidate(self):
+        with self._lock:
+            self._tags = None
+
+    def wait_until_ready(self, timeout=30.0, initial_delay=0.005, max_delay=0.5, progress=None) -> dict:
+        """Poll /api/tags with exponential backoff until it answers; returns the tag data."""
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
+        attempt = 0
+        while True:
+            tags = self.probe()
+            if tags is not None:
+                return tags
+            attempt += 1
+            if progress:
+                progress(attempt)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("❌ Timed out waiting for /api/tags")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+    def tags(self, refresh=False, timeout=10.0, progress=None) -> dict:
+        with self._lock:
+            if not refresh and self._tags is not None and time.monotonic() - self._fetched_at < self.ttl:
+                return self._tags
+        return self.wait_until_ready(timeout=timeout, progress=progress)
+
+    def model_names(self, refresh=False) -> list[str]:
+        return [m["name"] for m in self.tags(refresh=refresh).get("models", [])]
+
+    def has_model(self, model_name: str, refresh=False) -> bool:
+        return any(model_matches(model_name, name) for name in self.model_names(refresh=refresh))
+
+    def preload(self, model: str, background=True):
+        """Load `model` into memory with an empty generate request so the first prompt skips the load.
+
+        In the background this overlaps with whatever the caller does next (e.g. reading input).
+        """
+        def load():
+            payload = {"model": model}
+            if self.keep_alive is not None:
+                payload["keep_alive"] = self.keep_alive
+            try:
+                self.session.post(self._url("/api/generate"), json=payload, timeout=(PROBE_TIMEOUT[0], 300))
+            except requests.exceptions.RequestException:
+                pass  # the first real request will load it instead
+
+        if not background:
+            load()
+            return None
+        with self._lock:
+            thread = self._preloads.get(model)
+            if thread is not None and thread.is_alive():
+                return thread
+            thread = threading.Thread(target=load, name=f"preload-{model}", daemon=True)
+            self._preloads[model] = thread
+        thread.start()
+        return thread
+
+
+class PullError(Exception):
+    pass
+
+
+class ModelPuller:
+    """Pulls several models concurrently with retries and aggregated progress.
+
+    /api/pull frames are parsed into per-layer byte counts. Layers the server already has
+    (first reported as complete) count as skipped. A failed pull is retried with backoff;
+    Ollama keeps partially downloaded blobs, so a retry resumes rather than restarts.
+    """
+
+    def __init__(self, manager: ModelManager, session=None, max_concurrency=2, retries=3, backoff=1.0,
+                 timeout=(5, 600)):
+        self.manager = manager
+        self.session = session or manager.session
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._layers = {}  # (model, digest) -> {"total", "completed", "initial"}
+        self._started = None
+
+    def _update_layer(self, model: str, frame: dict):
+        key = (model, frame["digest"])
+        total = frame.get("total") or 0
+        completed = frame.get("completed") or 0
+        with self._lock:
+            layer = self._layers.get(key)
+            if layer is None:
+                # Whatever is already complete when we first see a layer was not downloaded by us
+                layer = self._layers[key] = {"total": total, "completed": completed, "initial": completed}
+            layer["total"] = total or layer["total"]
+            layer["completed"] = max(layer["completed"], completed)
+
+    def _pull_once(self, model: str):
+        response = self.session.post(
+            f"http://{self.manager.host}/api/pull",
+            json={"name": model, "stream": True},
+            stream=True,
+            timeout=self.timeout,
+        )
+        if response.status_code != 200:
+            raise PullError(f"HTTP {response.status_code}: {response.text}")
+        for line in response.iter_lines():
+            if not line:
+                continue
+            frame = json.loads(line.decode("utf-8"))
+            if "error" in frame:
+                raise PullError(frame["error"])
+            if frame.get("digest"):
+                self._update_layer(model, frame)
+            if frame.get("status") == "success":
+                return
+        raise PullError("stream ended before success")
+
+    def pull(self, model: str) -> dict:
+        started = time.monotonic()
+        if self.manager.has_model(model):
+            return {"model": model, "status": "present", "attempts": 0, "seconds": 0.0}
+        last_error = None
+        for attempt in range(1, self.retries + 2):
+            try:
+                self._pull_once(model)
+                self.manager.invalidate()
+                return {"model": model, "status": "pulled", "attempts": attempt,
+                        "seconds": time.monotonic() - started, **self.model_progress(model)}
+            except (requests.exceptions.RequestException, PullError, ValueError) as e:
+                last_error = e
+                if attempt <= self.retries:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+        return {"model": model, "status": "failed", "error": str(last_error), "attempts": self.retries + 1,
+                "seconds": time.monotonic() - started, **self.model_progress(model)}
+
+    def model_progress(self, model: str) -> dict:
+        with self._lock:
+            layers = [layer for (name, _), layer in self._layers.items() if name == model]
+        return {
+            "layers": len(layers),
+            "skipped_layers": sum(1 for l in layers if l["total"] and l["initial"] >= l["total"]),
+            "downloaded_bytes": sum(l["completed"] - l["initial"] for l in layers),
+        }
+
+    def progress(self) -> dict:
+        with self._lock:
+            layers = list(self._layers.values())
+        total = sum(l["total"] for l in layers)
+        completed = sum(l["completed"] for l in layers)
+        downloaded = sum(l["completed"] - l["initial"] for l in layers)
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {
+            "total_bytes": total,
+            "completed_bytes": completed,
+            "percent": 100.0 * completed / total if total else 0.0,
+            "bytes_per_sec": downloaded / elapsed if elapsed else 0.0,
+        }
+
+    def pull_many(self, models: list[str], report_every=1.0) -> list[dict]:
+        self._started = time.monotonic()
+        done = threading.Event()
+
+        def report():
+            while not done.wait(report_every):
+                p = self.progress()
+                print(f"\r⬇️ {p['completed_bytes'] / 1e6:,.0f}/{p['total_bytes'] / 1e6:,.0f} MB "
+                      f"({p['percent']:.1f}%) at {p['bytes_per_sec'] / 1e6:.1f} MB/s", end="", flush=True)
+
+        reporter = threading.Thread(target=report, daemon=True)
+        reporter.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+                results = list(pool.map(self.pull, models))
+        finally:
+            done.set()
+            reporter.join()
+            print()
+        return results
@@ -0,0 +1,153 @@
+import re
+import ast
+
+CONTEXT_KEYWORDS = re.compile(r"[A-Za-z_][A-Za-z0-9_]+")
+STOPWORDS = {"the", "and", "for", "with", "that", "this", "from", "into", "add", "make", "use", "all", "new",
+             "should", "function", "method", "class", "code", "value", "return", "print"}
+
+
+class PatchError(Exception):
+    pass
+
+
+def extract_diff(response: str) -> str:
+    blocks = re.findall(r"```(?:diff|patch)?\n(.*?)```", response, re.DOTALL)
+    return blocks[0] if blocks else response
+
+
+def parse_unified_diff(diff_text: str) -> list[dict]:
+    """Parse hunks into {"start", "before", "after", "ops"}; file headers and line counts are ignored.
+
+    "ops" lists the hunk's lines in order as (" ", "-" or "+", text).
+    """
+    hunks = []
+    current = None
+    lines = extract_diff(diff_text).splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("@@"):
+            match = re.match(r"@@ -(\d+)", line)
+            current = {"start": int(match.group(1)) if match else 0, "before": [], "after": [], "ops": []}
+            hunks.append(current)
+        elif line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = None
+        elif current is None or line.startswith("\\"):
+            continue
+        elif line.startswith("-"):
+            current["before"].append(line[1:])
+            current["ops"].append(("-", line[1:]))
+        elif line.startswith("+"):
+            current["after"].append(line[1:])
+            current["ops"].append(("+", line[1:]))
+        else:
+            # Context line; models often drop the leading space on blank lines
+            text = line[1:] if line.startswith(" ") else line
+            current["before"].append(text)
+            current["after"].append(text)
+            current["ops"].append((" ", text))
+    return [h for h in hunks if h["before"] != h["after"]]
+
+
+def _find_block(lines: list[str], block: list[str], hint: int, start: int) -> int:
+    """Index of `block` in lines[start:], closest to `hint`; falls back to whitespace-insensitive matching."""
+    for normalize in (lambda s: s, lambda s: " ".join(s.split())):
+        wanted = [normalize(line) for line in block]
+        matches = [i for i in range(start, len(lines) - len(block) + 1)
+                   if [normalize(line) for line in lines[i:i + len(block)]] == wanted]
+        if matches:
+            return min(matches, key=lambda i: abs(i - hint))
+    return -1
+
+
+def apply_unified_diff(original: str, diff_text: str) -> str:
+    """Apply a (possibly sloppy) unified diff by locating each hunk's context in the original.
+
+    Line numbers in the @@ headers are only used as a hint, so hunks written against an excerpt
+    of the file still apply to the whole file.
+    """
+    hunks = parse_unified_diff(diff_text)
+    if not hunks:
+        raise PatchError("response contained no diff hunks")
+
+    lines = original.splitlines()
+    cursor = 0
+    offset = 0
+    for hunk in hunks:
+        hint = max(hunk["start"] - 1 + offset, cursor)
+        if hunk["before"]:
+            index = _find_block(lines, hunk["before"], hint, cursor)
+            if index < 0:
+                raise PatchError(f"could not locate hunk starting at line {hunk['start']}")
+        else:
+            index = min(hint, len(lines))
+        # Context may only have matched after normalizing whitespace, so keep the original's lines for it
+        replacement = []
+        position = index
+        for op, text in hunk["ops"]:
+            if op == " ":
+                replacement.append(lines[position])
+            if op != "+":
+                position += 1
+            if op == "+":
+                replacement.append(text)
+        lines[index:position] = replacement
+        cursor = index + len(hunk["after"])
+        offset += len(hunk["after"]) - len(hunk["before"])
+
+    updated = "\n".join(lines)
+    return updated + "\n" if original.endswith("\n") else updated
+
+
+def _node_span(node) -> tuple[int, int]:
+    start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+    return start, node.end_lineno
+
+
+def relevant_chunks(code: str, instruction: str, max_lines=200):
+    """AST-aware excerpt of `code` for prompts about large files.
+
+    Keeps module-level statements (imports, constants) and the functions/classes whose names and
+    identifiers best match the instruction, within `max_lines`. Returns None when the whole file
+    fits or cannot be parsed, in which case callers should send the full file.
+    """
+    lines = code.splitlines()
+    if len(lines) <= max_lines:
+        return None
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    wanted = {word.lower() for word in CONTEXT_KEYWORDS.findall(instruction)} - STOPWORDS
+    keep = set()
+    scored = []
+    for node in tree.body:
+        start, end = _node_span(node)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names = {n.id.lower() for n in ast.walk(node) if isinstance(n, ast.Name)}
+            names |= {n.attr.lower() for n in ast.walk(node) if isinstance(n, ast.Attribute)}
+            score = 10 * (node.name.lower() in wanted) + len(wanted & names)
+            scored.append((score, start, end))
+        elif end - start < 20:
+            keep.update(range(start, end + 1))
+
+    # Only definitions the instruction refers to; if nothing matches, fall back to file order
+    matched = sorted((s for s in scored if s[0] > 0), key=lambda s: (-s[0], s[1])) or scored
+    budget = max_lines - len(keep)
+    for _, start, end in matched:
+        if end - start + 1 <= budget:
+            keep.update(range(start, end + 1))
+            budget -= end - start + 1
+
+    excerpt = []
+    skipped_from = None
+    for number in range(1, len(lines) + 1):
+        if number in keep:
+            if skipped_from is not None:
+                excerpt.append(f"# ... lines {skipped_from}-{number - 1} omitted ...")
+                skipped_from = None
+            excerpt.append(lines[number - 1])
+        elif skipped_from is None:
+            skipped_from = number
+    if skipped_from is not None:
+        excerpt.append(f"# ... lines {skipped_from}-{len(lines)} omitted ...")
+    return "\n".join(excerpt)
@@ -0,0 +1,132 @@
+import os
+import ast
+import sys
+import tempfile
+import importlib.machinery
+from functools import lru_cache
+
+FILENAME = "<candidate>"
+IMPORT_GUARDS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+STDIN_READS = {"read", "readline", "readlines"}
+EXIT_CALLS = {"exit", "_exit", "quit"}
+
+
+def candidate_path() -> list[str]:
+    """sys.path as a candidate script sees it.
+
+    Candidates run from the temp directory, so Tools/ (and run.py's directory) are not on their
+    path; otherwise `import llm` would pass here and fail when the script runs.
+    """
+    local = {os.path.dirname(os.path.abspath(__file__)), os.getcwd()}
+    main_file = getattr(sys.modules.get("__main__"), "__file__", None)
+    if main_file:
+        local.add(os.path.dirname(os.path.abspath(main_file)))
+    return [tempfile.gettempdir()] + [p for p in sys.path if p and os.path.abspath(p) not in local]
+
+
+@lru_cache(maxsize=1024)
+def module_available(name: str) -> bool:
+    if name in sys.builtin_module_names:
+        return True
+    try:
+        return importlib.machinery.PathFinder.find_spec(name, candidate_path()) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _call_name(node: ast.Call) -> str:
+    """Dotted name of the called function, e.g. 'time.sleep' or 'input'; '' if not a plain name."""
+    parts = []
+    func = node.func
+    while isinstance(func, ast.Attribute):
+        parts.append(func.attr)
+        func = func.value
+    if not isinstance(func, ast.Name):
+        return ""
+    parts.append(func.id)
+    return ".".join(reversed(parts))
+
+
+def _guards_imports(handler: ast.ExceptHandler) -> bool:
+    if handler.type is None:
+        return True
+    types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(isinstance(t, ast.Name) and t.id in IMPORT_GUARDS for t in types)
+
+
+def _loop_can_exit(loop: ast.While) -> bool:
+    for node in ast.walk(loop):
+        if isinstance(node, (ast.Break, ast.Return, ast.Raise)):
+            return True
+        if isinstance(node, ast.Call) and _call_name(node).split(".")[-1] in EXIT_CALLS:
+            return True
+    return False
+
+
+def _problem(node, code_lines: list[str], kind: str, message: str) -> str:
+    line = code_lines[node.lineno - 1].strip() if 0 < node.lineno <= len(code_lines) else ""
+    return f'  File "{FILENAME}", line {node.lineno}\n    {line}\n{kind}: {message}'
+
+
+def _find_problems(tree: ast.Module, code_lines: list[str], timeout) -> list[str]:
+    problems = []
+    guarded = set()
+    in_functions = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Try) and any(_guards_imports(h) for h in node.handlers):
+            guarded.update(id(n) for stmt in node.body for n in ast.walk(stmt))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            in_functions.update(id(n) for n in ast.walk(node))
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)) and id(node) not in guarded:
+            if isinstance(node, ast.ImportFrom):
+                names = [node.module] if node.module and not node.level else []
+            else:
+                names = [alias.name for alias in node.names]
+            for name in names:
+                top = name.split(".")[0]
+                if not module_available(top):
+                    problems.append(_problem(node, code_lines, "ModuleNotFoundError", f"No module named '{top}'"))
+        elif isinstance(node, ast.Call):
+            name = _call_name(node)
+            if name in ("input", "getpass", "getpass.getpass") or (
+                    name.startswith("sys.stdin.") and name.split(".")[-1] in STDIN_READS):
+                problems.append(_problem(node, code_lines, "BlockingCallError",
+                                         f"{name}() waits for keyboard input, which is not available when the "
+                                         "script runs unattended; use a hard-coded example value instead"))
+            elif name == "time.sleep" and node.args and isinstance(node.args[0], ast.Constant) \
+                    and isinstance(node.args[0].value, (int, float)) and timeout and node.args[0].value >= timeout:
+                problems.append(_problem(node, code_lines, "BlockingCallError",
+                                         f"sleeping {node.args[0].value}s exceeds the {timeout}s run time limit"))
+        elif isinstance(node, ast.While) and isinstance(node.test, ast.Constant) and node.test.value \
+                and id(node) not in in_functions and not _loop_can_exit(node):
+            # Only module-level loops; inside functions they are often daemon-thread workers
+            problems.append(_problem(node, code_lines, "BlockingCallError",
+                                     "this loop never exits and the script would be killed after "
+                                     f"{timeout}s; make it stop after a bounded number of iterations"))
+    return problems
+
+
+def precheck(code: str, timeout=10):
+    """Cheap in-process checks run before a candidate is executed.
+
+    Catches syntax errors, unguarded imports of modules that are not installed, and calls that
+    would block until the run times out (input(), stdin reads, long sleeps, `while True` with
+    no way out). Returns None if the code looks runnable, otherwise an error text in traceback
+    style that can go straight into the fix prompt.
+    """
+    try:
+        tree = ast.parse(code, FILENAME)
+        # Compiling to bytecode also catches errors the parser lets through ('return' outside function, ...)
+        compile(tree, FILENAME, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        lines = code.splitlines()
+        text = e.text or (lines[e.lineno - 1] if e.lineno and 0 < e.lineno <= len(lines) else "")
+        return f'  File "{FILENAME}", line {e.lineno}\n    {text.strip()}\nSyntaxError: {e.msg}'
+    except ValueError as e:  # e.g. null bytes in the source
+        return f"SyntaxError: {e}"
+    problems = _find_problems(tree, code.splitlines(), timeout)
+    if not problems:
+        return None
+    return "Static check failed before running the script:\n" + "\n".join(problems)
@@ -1,7 +1,12 @@
+import os
+import sys
 from llm import LLM
 
 if __name__ == "__main__":
     llm = LLM(model="")
-    llm.list_available_models()
-    MODEL = input("Modell name to pull: ")
-    llm.pull_model(MODEL)
+    # Models can be given as arguments or OLLAMA_MODELS="a,b" (e.g. in the container) to skip the prompt
+    models = sys.argv[1:] or [m for m in os.environ.get("OLLAMA_MODELS", "").split(",") if m.strip()]
+    if not models:
+        llm.list_available_models()
+        models = input("Modell name(s) to pull (comma separated): ").split(",")
+    llm.pull_models([m.strip() for m in models])
@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import math
+import time
+from collections import Counter, OrderedDict
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """In-memory Okapi BM25 inverted index over node texts; queries need no network call.
+
+    Saved as JSON next to the vector index so launches don't re-tokenize the corpus; nodes of
+    changed files are updated with add() and remove().
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {node_id: term frequency}
+        self.doc_lengths = {}
+        self.avg_length = 0.0
+        self._total_length = 0
+
+    @classmethod
+    def from_nodes(cls, nodes, **kwargs) -> "BM25Index":
+        index = cls(**kwargs)
+        for node in nodes:
+            index.add(node.node_id, node.get_content())
+        return index
+
+    def _update_average(self):
+        self.avg_length = self._total_length / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def add(self, node_id: str, text: str):
+        if node_id in self.doc_lengths:
+            self.remove([node_id])
+        tokens = tokenize(text)
+        self.doc_lengths[node_id] = len(tokens)
+        self._total_length += len(tokens)
+        for term, count in Counter(tokens).items():
+            self.postings.setdefault(term, {})[node_id] = count
+        self._update_average()
+
+    def remove(self, node_ids):
+        node_ids = {node_id for node_id in node_ids if node_id in self.doc_lengths}
+        if not node_ids:
+            return
+        for term in list(self.postings):
+            postings = self.postings[term]
+            for node_id in node_ids & postings.keys():
+                del postings[node_id]
+            if not postings:
+                del self.postings[term]
+        for node_id in node_ids:
+            self._total_length -= self.doc_lengths.pop(node_id)
+        self._update_average()
+
+    def save(self, path: str):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "postings": self.postings, "doc_lengths": self.doc_lengths}, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Read an index written by save(); raises OSError or ValueError if it is missing or damaged."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        try:
+            index = cls(k1=data["k1"], b=data["b"])
+            index.postings = data["postings"]
+            index.doc_lengths = data["doc_lengths"]
+            index._total_length = sum(index.doc_lengths.values())
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"malformed BM25 index: {e}") from e
+        index._update_average()
+        return index
+
+    def search(self, query: str, top_k=10) -> list[tuple[str, float]]:
+        n = len(self.doc_lengths)
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for node_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[node_id] / self.avg_length)
+                scores[node_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores.most_common(top_k)
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 prefilter plus dense retrieval, merged with reciprocal rank fusion.
+
+    When the best keyword hit clearly beats the runner-up (`dense_skip_margin`), the dense
+    path and its query embedding are skipped entirely. Query embeddings are kept in a small
+    LRU cache, and `rerank=True` reorders the fused list by query term coverage. Per-query
+    timings are left in `last_timings`.
+    """
+
+    def __init__(self, index, similarity_top_k=5, bm25_top_k=10, dense_skip_margin=2.0, rerank=False,
+                 rrf_k=60, cache_size=256, bm25=None):
+        super().__init__()
+        self.index = index
+        self.embed_model = index._embed_model
+        self.similarity_top_k = similarity_top_k
+        self.bm25_top_k = bm25_top_k
+        self.dense_skip_margin = dense_skip_margin
+        self.rerank = rerank
+        self.rrf_k = rrf_k
+        self.cache_size = cache_size
+        self._dense = index.as_retriever(similarity_top_k=similarity_top_k)
+        self._embeddings = OrderedDict()
+        # Pass the persisted keyword index from load_or_build_index; building it here tokenizes every node
+        self.bm25 = bm25 if bm25 is not None else BM25Index.from_nodes(index.docstore.docs.values())
+        self.last_timings = {}
+
+    def _query_embedding(self, query: str) -> list[float]:
+        if query in self._embeddings:
+            self._embeddings.move_to_end(query)
+            return self._embeddings[query]
+        embedding = self.embed_model.get_query_embedding(query)
+        self._embeddings[query] = embedding
+        if len(self._embeddings) > self.cache_size:
+            self._embeddings.popitem(last=False)
+        return embedding
+
+    def _keywords_decisive(self, hits: list[tuple[str, float]]) -> bool:
+        if not self.dense_skip_margin or not hits:
+            return False
+        return len(hits) == 1 or hits[0][1] >= self.dense_skip_margin * hits[1][1]
+
+    def _rerank(self, query: str, results: list[NodeWithScore]) -> list[NodeWithScore]:
+        terms = set(tokenize(query))
+        if not terms:
+            return results
+        for result in results:
+            coverage = len(terms & set(tokenize(result.node.get_content()))) / len(terms)
+            result.score = (result.score or 0.0) * (1 + coverage)
+        return sorted(results, key=lambda r: r.score, reverse=True)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        start = time.perf_counter()
+        query = query_bundle.query_str
+        bm25_hits = self.bm25.search(query, self.bm25_top_k)
+        bm25_done = time.perf_counter()
+
+        fused = Counter()
+        for rank, (node_id, _) in enumerate(bm25_hits):
+            fused[node_id] += 1 / (self.rrf_k + rank + 1)
+
+        dense_used = not self._keywords_decisive(bm25_hits)
+        if dense_used:
+            if query_bundle.embedding is None:
+                query_bundle = QueryBundle(query_str=query, embedding=self._query_embedding(query))
+            for rank, result in enumerate(self._dense.retrieve(query_bundle)):
+                fused[result.node.node_id] += 1 / (self.rrf_k + rank + 1)
+        dense_done = time.perf_counter()
+
+        results = [NodeWithScore(node=self.index.docstore.get_node(node_id), score=score)
+                   for node_id, score in fused.most_common(self.similarity_top_k)]
+        if self.rerank:
+            results = self._rerank(query, results)
+
+        end = time.perf_counter()
+        self.last_timings = {
+            "bm25_ms": (bm25_done - start) * 1000,
+            "dense_ms": (dense_done - bm25_done) * 1000 if dense_used else 0.0,
+            "total_ms": (end - start) * 1000,
+            "dense_used": dense_used,
+        }
+        return results
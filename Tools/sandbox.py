@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import queue
+import signal
+import struct
+import weakref
+import tempfile
+import threading
+import subprocess
+
+PYTHON = "python3"
+# Imported once per worker so generated scripts using them start without import cost
+DEFAULT_WARM_MODULES = ("json", "re", "math", "random", "datetime", "collections", "itertools", "functools",
+                        "pathlib", "typing", "traceback", "calendar", "statistics", "string")
+_HEADER = struct.Struct(">I")
+
+
+def _send(stream, message: dict):
+    data = json.dumps(message).encode("utf-8")
+    stream.write(_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def _receive(stream):
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    (length,) = _HEADER.unpack(header)
+    return json.loads(stream.read(length).decode("utf-8"))
+
+
+def _exec_child(code: str, cpu_seconds, memory_bytes):
+    """Runs in the forked child: apply limits, execute the script as __main__, never return."""
+    import types
+    import linecache
+    import traceback
+
+    exit_code = 0
+    try:
+        if cpu_seconds:
+            import resource
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if memory_bytes:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        filename = "<sandbox>"
+        linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+        # Match `python3 script.py`: own argv, and a real __main__ module so pickle and multiprocessing
+        # can look up classes and functions defined in the script
+        sys.argv = [filename]
+        main = types.ModuleType("__main__")
+        main.__file__ = filename
+        main.__builtins__ = __builtins__
+        sys.modules["__main__"] = main
+        exec(compile(code, filename, "exec"), main.__dict__)
+    except SystemExit as e:
+        if isinstance(e.code, int) or e.code is None:
+            exit_code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Skip this frame so the traceback starts in the script, as it would for `python3 script.py`
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def _run_forked(request: dict) -> dict:
+    """Fork the warm worker, run one script in the child and collect its output with limits."""
+    import time
+    import selectors
+
+    max_output = request["max_output"]
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        sys.stdin = open(os.devnull, "r")
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+        _exec_child(request["code"], request.get("cpu_seconds"), request.get("memory_bytes"))
+
+    os.close(out_w)
+    os.close(err_w)
+    buffers = {out_r: bytearray(), err_r: bytearray()}
+    selector = selectors.DefaultSelector()
+    for fd in buffers:
+        selector.register(fd, selectors.EVENT_READ)
+
+    deadline = time.monotonic() + request["timeout"]
+    timed_out = truncated = False
+    while selector.get_map():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        for key, _ in selector.select(remaining):
+            chunk = os.read(key.fd, 65536)
+            if not chunk:
+                selector.unregister(key.fd)
+                continue
+            buffers[key.fd] += chunk
+            if len(buffers[key.fd]) > max_output:
+                truncated = True
+        if truncated:
+            break
+
+    if timed_out or truncated:
+        os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+    selector.close()
+    os.close(out_r)
+    os.close(err_r)
+
+    returncode = os.waitstatus_to_exitcode(status)
+    stderr = buffers[err_r][:max_output].decode("utf-8", "replace")
+    if timed_out:
+        stderr = f"Timed out after {request['timeout']} seconds"
+    elif truncated:
+        stderr += f"\nOutput exceeded {max_output} bytes; script was stopped."
+    elif returncode < 0:
+        stderr += f"\nKilled by {signal.Signals(-returncode).name}"
+        if -returncode == signal.SIGXCPU:
+            stderr += f" (CPU limit of {request.get('cpu_seconds')}s exceeded)"
+    return {
+        "returncode": returncode,
+        "stdout": buffers[out_r][:max_output].decode("utf-8", "replace"),
+        "stderr": stderr,
+        "timed_out": timed_out,
+        "truncated": truncated,
+    }
+
+
+def worker_main(warm_modules):
+    # Scripts used to run from a temp file, so make that the import root instead of Tools/
+    sys.path[0] = tempfile.gettempdir()
+    for name in warm_modules:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        request = _receive(stdin)
+        if request is None:
+            return
+        _send(stdout, _run_forked(request))
+
+
+class _Worker:
+    def __init__(self, warm_modules):
+        self.process = subprocess.Popen(
+            [PYTHON, "-u", os.path.abspath(__file__), "--worker", json.dumps(list(warm_modules))],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self.runs = 0
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, request: dict) -> dict:
+        _send(self.process.stdin, request)
+        result = _receive(self.process.stdout)
+        if result is None:
+            raise EOFError("sandbox worker exited")
+        self.runs += 1
+        return result
+
+    def stop(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class SandboxPool:
+    """Pool of pre-started Python workers that fork to run untrusted scripts.
+
+    A worker pays interpreter startup (and imports of `warm_modules`) once; each run is a fork of
+    that warm process with CPU/memory rlimits, a wall-clock timeout and capped output. Workers are
+    replaced after `max_runs` runs.
+    """
+
+    def __init__(self, size=None, timeout=10, cpu_seconds=None, memory_bytes=1024 * 1024 * 1024,
+                 max_output=1024 * 1024, max_runs=200, warm_modules=DEFAULT_WARM_MODULES):
+        self.size = size or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        # The wall-clock timeout should normally fire first; the CPU limit is a backstop
+        self.cpu_seconds = cpu_seconds or timeout + 1
+        self.memory_bytes = memory_bytes
+        self.max_output = max_output
+        self.max_runs = max_runs
+        self.warm_modules = warm_modules
+        self._idle = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+        # Every live worker; stopped if the pool is dropped (or at exit) without close()
+        self._workers = set()
+        self._finalizer = weakref.finalize(self, _stop_workers, self._workers)
+
+    @staticmethod
+    def supported() -> bool:
+        return hasattr(os, "fork")
+
+    def prewarm(self):
+        """Start every worker now so their startup overlaps with other work."""
+        with self._lock:
+            while self._started < self.size:
+                self._idle.put(self._spawn())
+                self._started += 1
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.warm_modules)
+        self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker):
+        self._workers.discard(worker)
+        worker.stop()
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            if self._idle.empty() and self._started < self.size:
+                self._started += 1
+                return self._spawn()
+        return self._idle.get()
+
+    def _checkin(self, worker: _Worker):
+        if worker.alive() and worker.runs < self.max_runs:
+            self._idle.put(worker)
+            return
+        self._retire(worker)
+        self._idle.put(self._spawn())
+
+    def run(self, code: str, timeout=None) -> dict:
+        request = {
+            "code": code,
+            "timeout": timeout or self.timeout,
+            "cpu_seconds": self.cpu_seconds,
+            "memory_bytes": self.memory_bytes,
+            "max_output": self.max_output,
+        }
+        worker = self._checkout()
+        try:
+            return worker.run(request)
+        except (OSError, EOFError, ValueError) as e:
+            worker.process.kill()
+            return {"returncode": 1, "stdout": "", "stderr": f"Sandbox worker failed: {e}",
+                    "timed_out": False, "truncated": False}
+        finally:
+            self._checkin(worker)
+
+    def close(self):
+        with self._lock:
+            while not self._idle.empty():
+                self._retire(self._idle.get())
+            self._started = 0
+
+
+def _stop_workers(workers: set):
+    for worker in list(workers):
+        worker.stop()
+    workers.clear()
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["--worker"]:
+    worker_main(json.loads(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WARM_MODULES)
@@ -0,0 +1,128 @@
+import os
+import json
+import math
+import threading
+
+INDEX_FILE = ".library.json"
+HEADER_LINES = 5
+
+
+def normalize_purpose(purpose: str) -> str:
+    return " ".join(purpose.lstrip("> ").lower().split())
+
+
+def read_header(path: str) -> dict:
+    """Purpose and verification status from the '# Purpose:' / '# Verified:' lines save_code writes."""
+    header = {"purpose": None, "verified": False}
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for _ in range(HEADER_LINES):
+            line = f.readline()
+            if line.startswith("# Purpose:"):
+                header["purpose"] = line[len("# Purpose:"):].strip()
+            elif line.startswith("# Verified:"):
+                header["verified"] = line[len("# Verified:"):].strip().lower() == "yes"
+    return header
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class ScriptLibrary:
+    """Nearest-neighbour lookup over the purposes of previously evolved scripts.
+
+    Each script's purpose line is embedded once; vectors are kept in `<directory>/.library.json`
+    together with the file's mtime, so a refresh only reads headers of new or changed files and
+    embeds their purposes in one batch. An exact (normalized) purpose match needs no embedding.
+    """
+
+    def __init__(self, directory="evolved_scripts", embedder=None):
+        self.directory = directory
+        self.embedder = embedder
+        self.entries = {}  # filename -> {"mtime", "purpose", "verified", "vector"}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _load(self):
+        try:
+            with open(self._index_path(), "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._index_path()
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.entries, f)
+        os.replace(path + ".tmp", path)
+
+    def refresh(self, embed=True):
+        with self._lock:
+            try:
+                names = {e.name: e.stat().st_mtime for e in os.scandir(self.directory)
+                         if e.is_file() and e.name.endswith(".py")}
+            except FileNotFoundError:
+                names = {}
+            changed = len(self.entries) != len(names.keys() & self.entries.keys())
+            self.entries = {name: entry for name, entry in self.entries.items() if name in names}
+            for name, mtime in names.items():
+                entry = self.entries.get(name)
+                if entry is None or entry["mtime"] != mtime:
+                    header = read_header(os.path.join(self.directory, name))
+                    vector = entry["vector"] if entry and entry["purpose"] == header["purpose"] else None
+                    # Files without a purpose line are kept too, so they aren't re-read on every refresh
+                    self.entries[name] = dict(header, mtime=mtime, vector=vector)
+                    changed = True
+            missing = [name for name, entry in self.entries.items() if entry["vector"] is None and entry["purpose"]]
+            if embed and missing and self.embedder is not None:
+                vectors = self.embedder.embed([self.entries[name]["purpose"] for name in missing])
+                for name, vector in zip(missing, vectors):
+                    self.entries[name]["vector"] = _unit(vector)
+                changed = True
+            if changed:
+                self._save()
+
+    def exact(self, purpose: str, verified_only=True):
+        """Path of a script saved for the same purpose (ignoring case and spacing), newest first."""
+        wanted = normalize_purpose(purpose)
+        with self._lock:
+            matches = sorted((name for name, entry in self.entries.items()
+                              if entry["purpose"] and normalize_purpose(entry["purpose"]) == wanted
+                              and (entry["verified"] or not verified_only)),
+                             reverse=True)
+        return os.path.join(self.directory, matches[0]) if matches else None
+
+    def nearest(self, purpose: str, k=1, verified_only=True) -> list[tuple[float, str, dict]]:
+        """(cosine similarity, path, entry) of the k closest scripts."""
+        with self._lock:
+            candidates = [(name, entry) for name, entry in self.entries.items()
+                          if entry["vector"] is not None and (entry["verified"] or not verified_only)]
+        if not candidates or self.embedder is None:
+            return []
+        query = _unit(self.embedder.embed([purpose])[0])
+        scored = [(sum(a * b for a, b in zip(query, entry["vector"])), os.path.join(self.directory, name), entry)
+                  for name, entry in candidates]
+        return sorted(scored, key=lambda s: s[0], reverse=True)[:k]
+
+    def lookup(self, purpose: str, verified_only=True):
+        """Best match as (similarity, path, code); exact purpose matches score 1.0. None if empty."""
+        self.refresh(embed=False)
+        path = self.exact(purpose, verified_only)
+        if path is not None:
+            score = 1.0
+        else:
+            self.refresh()
+            best = self.nearest(purpose, k=1, verified_only=verified_only)
+            if not best:
+                return None
+            score, path, _ = best[0]
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+        # Drop the header lines save_code added
+        body = code.split("\n\n", 1)[1] if code.startswith("# Purpose:") and "\n\n" in code else code
+        return score, path, body
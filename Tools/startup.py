@@ -0,0 +1,50 @@
+import gc
+import os
+import sys
+import runpy
+import importlib
+import threading
+import traceback
+
+
+def preimport(*names) -> threading.Thread:
+    """Import modules on a daemon thread so the real import later finds them in sys.modules.
+
+    Missing optional dependencies are ignored here; the real import reports them.
+    """
+    def load():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass
+
+    thread = threading.Thread(target=load, name="preimport", daemon=True)
+    thread.start()
+    return thread
+
+
+def run_in_process(path: str, argv=()):
+    """Run a script as __main__ in this interpreter, reusing every module already imported.
+
+    Behaves like `python3 path` for the script: its own sys.argv and sys.path[0], and exits,
+    Ctrl+C and uncaught errors end the script instead of the caller.
+    """
+    saved_argv, saved_path = sys.argv, sys.path[:]
+    sys.argv = [path, *argv]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        if isinstance(e.code, str):
+            print(e.code)
+        elif e.code:
+            print(f"⚠️ Exited with status {e.code}")
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted.")
+    except Exception:
+        traceback.print_exc()
+    finally:
+        sys.argv, sys.path[:] = saved_argv, saved_path
+        # Collect the script's objects now; a dropped SandboxPool stops its workers from a finalizer
+        gc.collect()
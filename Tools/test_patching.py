@@ -0,0 +1,91 @@
+import pytest
+from patching import PatchError, apply_unified_diff, parse_unified_diff, relevant_chunks
+
+
+def make_module(functions=30, body_lines=8):
+    lines = ["import os", "", "LIMIT = 3", ""]
+    for i in range(functions):
+        lines.append(f"def func_{i}(x):")
+        lines += [f"    x = x + {j}" for j in range(body_lines)]
+        lines += ["    return x", ""]
+    return "\n".join(lines) + "\n"
+
+
+def test_parse_skips_headers_and_noop_hunks():
+    diff = "--- a/f.py\n+++ b/f.py\n@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3\n@@ -9 +9 @@\n same\n"
+    hunks = parse_unified_diff(diff)
+    assert len(hunks) == 1
+    assert hunks[0]["start"] == 1
+    assert hunks[0]["before"] == ["a = 1", "b = 2"] and hunks[0]["after"] == ["a = 1", "b = 3"]
+    assert hunks[0]["ops"] == [(" ", "a = 1"), ("-", "b = 2"), ("+", "b = 3")]
+
+
+def test_diff_in_fenced_block():
+    response = "Here you go:\n```diff\n@@ -1 +1 @@\n-x = 1\n+x = 2\n```\nDone."
+    assert apply_unified_diff("x = 1\ny = 2\n", response) == "x = 2\ny = 2\n"
+
+
+def test_hunk_against_excerpt_applies_to_full_file():
+    code = make_module()
+    excerpt = relevant_chunks(code, "change func_20", max_lines=40)
+    assert excerpt is not None and "def func_20(x):" in excerpt
+    # Line numbers refer to the excerpt, not the file
+    excerpt_line = excerpt.splitlines().index("def func_20(x):") + 1
+    diff = (f"@@ -{excerpt_line},3 +{excerpt_line},3 @@\n"
+            " def func_20(x):\n"
+            "-    x = x + 0\n"
+            "+    x = x * 2\n"
+            "     x = x + 1\n")
+    updated = apply_unified_diff(code, diff)
+    lines = updated.splitlines()
+    start = lines.index("def func_20(x):")
+    assert lines[start + 1] == "    x = x * 2"
+    # Identical lines in the other functions are untouched
+    assert updated.count("    x = x + 0") == code.count("    x = x + 0") - 1
+
+
+def test_hint_picks_nearest_duplicate_context():
+    code = "a = 1\nb = 2\n\na = 1\nb = 2\n"
+    diff = "@@ -4,2 +4,2 @@\n a = 1\n-b = 2\n+b = 5\n"
+    assert apply_unified_diff(code, diff) == "a = 1\nb = 2\n\na = 1\nb = 5\n"
+
+
+def test_whitespace_only_context_mismatch():
+    code = "def f():\n    if True:\n        return 1\n"
+    # The model re-indented the context with tabs
+    diff = "@@ -1,3 +1,3 @@\n def f():\n \tif True:\n-\t\treturn 1\n+        return 2\n"
+    assert apply_unified_diff(code, diff) == "def f():\n    if True:\n        return 2\n"
+
+
+def test_pure_insertion_uses_line_hint():
+    code = "a = 1\nb = 2\n"
+    assert apply_unified_diff(code, "@@ -2,0 +2,1 @@\n+c = 3\n") == "a = 1\nc = 3\nb = 2\n"
+
+
+def test_later_hunks_account_for_earlier_offsets():
+    code = "a\nb\nc\nd\ne\n"
+    diff = "@@ -1 +1,2 @@\n-a\n+a1\n+a2\n@@ -5 +6 @@\n-e\n+E\n"
+    assert apply_unified_diff(code, diff) == "a1\na2\nb\nc\nd\nE\n"
+
+
+def test_missing_context_raises():
+    with pytest.raises(PatchError):
+        apply_unified_diff("a = 1\n", "@@ -1 +1 @@\n-b = 1\n+b = 2\n")
+
+
+def test_no_hunks_raises():
+    with pytest.raises(PatchError):
+        apply_unified_diff("a = 1\n", "I could not find anything to change.")
+
+
+def test_relevant_chunks_small_or_unparsable_file():
+    assert relevant_chunks("x = 1\n", "anything") is None
+    assert relevant_chunks("def (:\n" * 300, "anything", max_lines=10) is None
+
+
+def test_relevant_chunks_keeps_module_statements_and_marks_gaps():
+    excerpt = relevant_chunks(make_module(), "fix func_7", max_lines=30)
+    lines = excerpt.splitlines()
+    assert "import os" in lines and "LIMIT = 3" in lines
+    assert "def func_7(x):" in lines and "def func_8(x):" not in lines
+    assert any(line.startswith("# ... lines") for line in lines)
@@ -0,0 +1,66 @@
+from precheck import precheck
+
+
+def test_runnable_code_passes():
+    assert precheck("import json\nprint(json.dumps({'a': 1}))\n") is None
+
+
+def test_syntax_error():
+    problem = precheck("def f(:\n    pass\n")
+    assert "SyntaxError" in problem and "line 1" in problem
+
+
+def test_compile_time_error():
+    assert "SyntaxError" in precheck("return 1\n")
+
+
+def test_missing_module():
+    problem = precheck("import numpy_that_does_not_exist\n")
+    assert "No module named 'numpy_that_does_not_exist'" in problem
+
+
+def test_tools_modules_are_not_importable_from_candidates():
+    # Candidates run from the temp directory, not Tools/
+    assert "No module named 'llm'" in precheck("import llm\n")
+
+
+def test_guarded_imports_pass():
+    code = ("try:\n    import numpy_that_does_not_exist as np\nexcept ImportError:\n    np = None\n"
+            "try:\n    from yaml_that_does_not_exist import load\nexcept (ModuleNotFoundError, OSError):\n    load = None\n")
+    assert precheck(code) is None
+
+
+def test_import_guarded_by_unrelated_exception_fails():
+    code = "try:\n    import numpy_that_does_not_exist\nexcept KeyError:\n    pass\n"
+    assert precheck(code) is not None
+
+
+def test_relative_and_submodule_imports():
+    assert precheck("import os.path\nfrom collections import abc\n") is None
+    assert "No module named 'nope_pkg'" in precheck("from nope_pkg.sub import thing\n")
+
+
+def test_input_is_blocking():
+    assert "BlockingCallError" in precheck("name = input('Name: ')\n")
+    assert "BlockingCallError" in precheck("import sys\ndata = sys.stdin.read()\n")
+
+
+def test_long_sleep_uses_timeout():
+    assert "BlockingCallError" in precheck("import time\ntime.sleep(30)\n", timeout=10)
+    assert precheck("import time\ntime.sleep(0.5)\n", timeout=10) is None
+
+
+def test_endless_loop():
+    assert "BlockingCallError" in precheck("while True:\n    print('tick')\n")
+
+
+def test_while_true_with_exit():
+    for body in ("    if n > 3:\n        break\n", "    if n > 3:\n        raise SystemExit\n",
+                 "    if n > 3:\n        sys.exit(0)\n"):
+        code = "import sys\nn = 0\nwhile True:\n    n += 1\n" + body
+        assert precheck(code) is None, body
+
+
+def test_while_true_inside_function_is_allowed():
+    code = "def worker():\n    while True:\n        pass\n"
+    assert precheck(code) is None
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("llama_index.core")
+from retrieval import BM25Index
+
+
+def build(texts: dict) -> BM25Index:
+    index = BM25Index()
+    for node_id, text in texts.items():
+        index.add(node_id, text)
+    return index
+
+
+def test_search_ranks_matching_node_first():
+    index = build({"a": "the board meets in spring", "b": "budget is set in may", "c": "spring spring board"})
+    assert [node_id for node_id, _ in index.search("spring board")][:1] == ["c"]
+    assert index.search("nothing matches") == []
+
+
+def test_remove_matches_index_built_without_the_node():
+    index = build({"a": "alpha common", "b": "beta common words", "c": "gamma"})
+    index.remove(["b", "missing"])
+    expected = build({"a": "alpha common", "c": "gamma"})
+    assert index.postings == expected.postings
+    assert index.doc_lengths == expected.doc_lengths
+    assert index.avg_length == expected.avg_length
+
+
+def test_add_replaces_existing_node():
+    index = build({"a": "old text here"})
+    index.add("a", "new")
+    assert index.postings == {"new": {"a": 1}} and index.doc_lengths == {"a": 1}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build({"a": "alpha common", "b": "beta common words"})
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("common beta") == index.search("common beta")
+    assert loaded.avg_length == index.avg_length
+
+
+def test_load_rejects_damaged_file(tmp_path):
+    path = tmp_path / "bm25.json"
+    path.write_text('{"postings": {}}')
+    with pytest.raises(ValueError):
+        BM25Index.load(str(path))
+    path.write_text("{not json")
+    with pytest.raises(ValueError):
+        BM25Index.load(str(path))
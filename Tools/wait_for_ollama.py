@@ -1,17 +1,10 @@
-import time
-import requests
+from models import ModelManager
 
-OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_HOST = "localhost:11434"
 
 print("⏳ Waiting for Ollama to be ready...")
-for _ in range(30):
-    try:
-        res = requests.get(f"{OLLAMA_HOST}/api/tags")
-        if res.status_code == 200:
-            print("✅ Ollama is ready.")
-            break
-    except Exception:
-        pass
-    time.sleep(1)
-else:
+try:
+    ModelManager(OLLAMA_HOST).wait_until_ready(timeout=30)
+except RuntimeError:
     raise RuntimeError("❌ Ollama did not start in time.")
+print("✅ Ollama is ready.")
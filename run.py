@@ -1,24 +1,43 @@
 import os
+import sys
 import subprocess
 
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Tools")
+sys.path.insert(0, TOOLS_DIR)
+from file_index import find_python_files
+from startup import preimport, run_in_process
+
+# Imports most tools need; loaded in the background while the menu is on screen
+PREWARM_MODULES = ("llm", "docindex", "retrieval", "llama_index.core.query_engine")
+
+# Tools/ also holds the modules these programs import; only these are offered in the menu
+TOOL_PROGRAMS = ("agent.py", "askdocs.py", "evolve.py", "exception.py", "message.py", "my_script.py",
+                 "pull.py", "suggestions.py", "wait_for_ollama.py")
+
 def find_python_scripts(base_dir):
     scripts = []
-    for root, dirs, files in os.walk(base_dir):
-        for file in files:
-            if (
-                file.endswith(".py")
-                and not file.startswith("__")
-                and file != "run.py"  # Exclude run.py here
-            ):
-                full_path = os.path.join(root, file)
-                scripts.append(full_path)
+    for path in find_python_files(base_dir, exclude={"run.py"}):  # Exclude run.py here
+        full_path = os.path.abspath(path)
+        if os.path.dirname(full_path) == TOOLS_DIR and os.path.basename(full_path) not in TOOL_PROGRAMS:
+            continue
+        scripts.append(path)
     return scripts
 
 def clear_screen():
     os.system("cls" if os.name == "nt" else "clear")
 
+def run_script(path, in_process=True):
+    # Tools share this interpreter and its already imported modules; anything else gets a fresh one
+    if in_process and os.path.dirname(os.path.abspath(path)) == TOOLS_DIR:
+        run_in_process(path)
+    else:
+        subprocess.run(["python3", path])
+
 def main():
     base_dir = "."  # Start from current directory
+    in_process = "--subprocess" not in sys.argv[1:]
+    if in_process:
+        preimport(*PREWARM_MODULES)
 
     while True:
         clear_screen()
@@ -43,7 +62,7 @@ def main():
             elif 1 <= choice <= len(scripts):
                 selected = scripts[choice - 1]
                 print(f"\n▶️ Running: {selected}\n")
-                subprocess.run(["python3", selected])
+                run_script(selected, in_process)
                 input("\n✅ Finished. Press Enter to return to the menu...")
             else:
                 print("Invalid choice.")